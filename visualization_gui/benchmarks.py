@@ -0,0 +1,440 @@
+"""
+Micro-benchmarks for the analysis pipeline.
+
+Run from the visualization_gui folder, for example:
+
+    python benchmarks.py tokenizer
+"""
+import argparse
+import os
+import random
+import time
+
+SAMPLE_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SampleData")
+
+
+def load_sample_summaries():
+    from excel_reader import read_excel
+    summaries = []
+    for name in ["sample_train.xlsx", "mask.xlsx", "mask_updated.xlsx"]:
+        path = os.path.join(SAMPLE_DATA_DIR, name)
+        if not os.path.exists(path):
+            continue
+        for df in read_excel(path, sheet_name=None).values():
+            df.columns = [col.lower() for col in df.columns]
+            if 'summary' in df.columns:
+                summaries.extend(df['summary'].dropna().astype(str))
+    return summaries
+
+
+def synthetic_summaries(rows, seed=0):
+    samples = load_sample_summaries()
+    rng = random.Random(seed)
+    return [rng.choice(samples) for _ in range(rows)]
+
+
+def bench_tokenizer(rows=2000, sheets=40):
+    from text_preprocessing import Tokenizer
+    summaries = synthetic_summaries(rows)
+
+    start = time.perf_counter()
+    tokenizer = Tokenizer()
+    tokenizer.load()
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in tokenizer.tokenize_many(summaries):
+        pass
+    per_row = (time.perf_counter() - start) / rows
+
+    print(f"Setup (MeCab, stopwords, WordNet): {setup * 1000:.1f} ms")
+    print(f"Per row:                           {per_row * 1e6:.1f} us")
+    print(f"Setup equals ~{setup / per_row:.0f} rows of tokenization")
+    print(f"{sheets} sheets x {rows // sheets} rows, rebuilt per sheet: {(setup * sheets + per_row * rows):.2f} s")
+    print(f"{sheets} sheets x {rows // sheets} rows, warm tokenizer:    {(setup + per_row * rows):.2f} s")
+
+
+def bench_parallel(rows=200000):
+    from text_preprocessing import Tokenizer
+    # Unique texts so the summary cache does not hide the tokenization cost
+    summaries = [f"{text} #{i}" for i, text in enumerate(synthetic_summaries(rows))]
+    for workers in [1, 2, 4, os.cpu_count() or 1]:
+        tokenizer = Tokenizer(cache_size=0)
+        start = time.perf_counter()
+        for _ in tokenizer.tokenize_many(summaries, workers=workers, min_rows=0):
+            pass
+        print(f"{workers:>3} workers: {time.perf_counter() - start:.2f} s for {rows} rows")
+
+
+def bench_ascii_fast_path(rows=20000):
+    from text_preprocessing import Tokenizer
+    summaries = [f"{text} #{i}" for i, text in enumerate(synthetic_summaries(rows))]
+    ascii_share = sum(text.isascii() for text in summaries) / rows
+    results = {}
+    for fast_path in [False, True]:
+        tokenizer = Tokenizer(cache_size=0, ascii_fast_path=fast_path)
+        tokenizer.load()
+        start = time.perf_counter()
+        results[fast_path] = list(tokenizer.tokenize_many(summaries, workers=1))
+        label = "ASCII fast path" if fast_path else "MeCab every row"
+        print(f"{label}: {time.perf_counter() - start:.2f} s for {rows} rows ({ascii_share:.0%} ASCII-only)")
+    mismatches = sum(a != b for a, b in zip(results[False], results[True]))
+    print(f"Rows with different tokens: {mismatches}")
+
+
+def bench_backends(top_n=40):
+    from collections import Counter
+    from text_preprocessing import Tokenizer, iter_tokens
+    from tokenizer_backends import BACKENDS
+    from config import tokenizer_backend
+    summaries = load_sample_summaries()
+    top_words = {}
+    for name in BACKENDS:
+        tokenizer = Tokenizer(cache_size=0, backend=name)
+        try:
+            tokenizer.load()
+        except Exception as e:
+            print(f"{name}: unavailable ({e})")
+            continue
+        counts = Counter()
+        start = time.perf_counter()
+        for tokens in iter_tokens(summaries, tokenizer=tokenizer, workers=1):
+            counts.update(tokens)
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        top_words[name] = {word for word, _ in counts.most_common(top_n)}
+        print(f"{name}: {total / elapsed:,.0f} tokens/s, {len(summaries) / elapsed:,.0f} rows/s, {len(counts)} distinct words")
+    reference = top_words.get(tokenizer_backend)
+    if reference:
+        for name, words in top_words.items():
+            overlap = len(words & reference) / max(len(reference), 1)
+            print(f"Top {top_n} overlap {name} vs {tokenizer_backend}: {overlap:.0%}")
+
+
+def bench_top_k(words=200000, vocabulary=50000, capacity=2000, top_n=100, seed=0):
+    """Compares SpaceSaving against exact counts on Zipf-distributed words."""
+    from collections import Counter
+    from heavy_hitters import SpaceSaving
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    stream = rng.choices([f"w{rank}" for rank in range(vocabulary)], weights=weights, k=words)
+
+    exact = Counter(stream)
+    # Split the stream as if it came from several sheets, then merge
+    summary = SpaceSaving(capacity)
+    for part in range(4):
+        sheet_summary = SpaceSaving(capacity)
+        sheet_summary.update(stream[part::4])
+        summary.merge(sheet_summary)
+
+    bound = summary.total / capacity
+    items = summary.items()
+    assert all(count >= exact[word] for word, count, _ in items), "count below exact count"
+    assert all(count - exact[word] <= error for word, count, error in items), "error bound violated"
+    assert all(error <= bound for _, _, error in items), "error above total / capacity"
+    guaranteed = {word for word, count in exact.items() if count > bound}
+    assert guaranteed <= {word for word, _, _ in items}, "frequent word missing"
+
+    exact_top = {word for word, _ in exact.most_common(top_n)}
+    approx_top = {word for word, _, _ in items[:top_n]}
+    print(f"{words} words, {len(exact)} distinct, capacity {capacity}, error bound {bound:.0f}")
+    print(f"Top {top_n} recall: {len(exact_top & approx_top) / top_n:.0%}")
+    print(f"Max overestimate: {max(count - exact[word] for word, count, _ in items)}")
+
+
+def bench_workbook_cache(sheets=50, words=2000):
+    """Times switching categories in a word count table, cold and from the cache."""
+    import tempfile
+    import pandas as pd
+    from workbook_cache import WorkbookCache
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench_wordcount.xlsx")
+        table = pd.DataFrame({'Word': [f"w{i}" for i in range(words)], 'Count': range(words, 0, -1)})
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+            for i in range(sheets):
+                table.to_excel(writer, sheet_name=f"Category {i}", index=False)
+        sheet_names = [f"Category {i}" for i in range(sheets)]
+
+        start = time.perf_counter()
+        for name in sheet_names[:5]:
+            pd.read_excel(path, sheet_name=name)
+        uncached = (time.perf_counter() - start) / 5
+
+        cache = WorkbookCache()
+        start = time.perf_counter()
+        cache.read_workbook(path)
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        for name in sheet_names:
+            cache.read_sheet(path, name)
+        switch = (time.perf_counter() - start) / sheets
+    print(f"{sheets} sheets x {words} words")
+    print(f"Switch category, pd.read_excel per switch: {uncached * 1000:.1f} ms")
+    print(f"Prefetch all sheets (background thread):   {load * 1000:.1f} ms")
+    print(f"Switch category, from the cache:           {switch * 1000:.3f} ms")
+
+
+def bench_sidecar(rows=100000):
+    """Times the first (Excel) and later (Parquet sidecar) loads of a report."""
+    import tempfile
+    import pandas as pd
+    from sidecar_cache import SidecarCache
+    from workbook_cache import WorkbookCache
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench_report.xlsx")
+        summaries = synthetic_summaries(rows)
+        pd.DataFrame({
+            'Issue key': [f"BUG-{i}" for i in range(rows)],
+            'Summary': summaries,
+            'Priority': random.Random(0).choices(["Blocker", "High", "Medium", "Low"], k=rows),
+            'Created': pd.date_range("2024-01-01", periods=rows, freq="min"),
+        }).to_excel(path, index=False)
+        sidecar = SidecarCache(os.path.join(directory, "sidecars"))
+        timings = []
+        for columns in [None, None, ['summary']]:
+            start = time.perf_counter()
+            WorkbookCache(sidecar=sidecar).read_workbook(path, columns)
+            timings.append(time.perf_counter() - start)
+    print(f"{rows} rows")
+    print(f"First load (Excel, writes sidecar): {timings[0]:.2f} s")
+    print(f"Later load (sidecar, all columns):  {timings[1]:.3f} s")
+    print(f"Later load (sidecar, summary only): {timings[2]:.3f} s")
+
+
+def _peak_memory():
+    # Peak resident memory of this process in bytes (Linux), or None where unsupported
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _measure_read(path, engine):
+    # Runs in a fresh process so each engine's peak memory is measured separately
+    import tracemalloc
+    from excel_reader import read_excel
+    before = _peak_memory()
+    start = time.perf_counter()
+    read_excel(path, engine=engine, sheet_name=None)
+    elapsed = time.perf_counter() - start
+    if before is not None:
+        return elapsed, _peak_memory() - before
+    # Elsewhere, fall back to Python heap allocations (misses native memory)
+    tracemalloc.start()
+    read_excel(path, engine=engine, sheet_name=None)
+    return elapsed, tracemalloc.get_traced_memory()[1]
+
+
+def bench_excel_engines(rows=100000):
+    """Times each Excel engine on SampleData and a synthetic export, with peak memory."""
+    import multiprocessing
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    import pandas as pd
+    from excel_reader import ENGINES, calamine_available
+    engines = [engine for engine in ENGINES if engine != "calamine" or calamine_available()]
+    if len(engines) < len(ENGINES):
+        print("calamine: not installed (pip install python-calamine)")
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic = os.path.join(directory, f"synthetic_{rows}.xlsx")
+        pd.DataFrame({
+            'Issue key': [f"BUG-{i}" for i in range(rows)],
+            'Summary': synthetic_summaries(rows),
+            'Priority': random.Random(0).choices(["Blocker", "High", "Medium", "Low"], k=rows),
+            'Created': pd.date_range("2024-01-01", periods=rows, freq="min"),
+            'Resolved': pd.date_range("2024-01-02", periods=rows, freq="min"),
+        }).to_excel(synthetic, index=False)
+        paths = sorted(
+            os.path.join(SAMPLE_DATA_DIR, name) for name in os.listdir(SAMPLE_DATA_DIR) if name.endswith(".xlsx")
+        ) + [synthetic]
+        for path in paths:
+            for engine in engines:
+                # Spawned, not forked, so the child does not inherit this process's peak memory
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    elapsed, peak = pool.submit(_measure_read, path, engine).result()
+                print(f"{os.path.basename(path):<36} {engine:<9} {elapsed:8.3f} s  {peak / 2**20:8.1f} MiB peak")
+
+
+def bench_report_loader(rows=200000):
+    """Compares the memory of a full untyped export with typed, projected frames."""
+    import tempfile
+    import pandas as pd
+    from excel_reader import read_excel
+    from report_loader import apply_schema
+    from workbook_cache import normalize_columns
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench_export.xlsx")
+        export = pd.DataFrame({
+            'Issue key': [f"BUG-{i}" for i in range(rows)],
+            'Summary': synthetic_summaries(rows),
+            'Priority': rng.choices(["Blocker", "High", "Medium", "Low"], k=rows),
+            'Custom field (Category)': rng.choices(["UI", "API", "Data", "Performance", "Other"], k=rows),
+            'Created': pd.date_range("2024-01-01", periods=rows, freq="min").strftime("%d/%m/%Y %H:%M"),
+            'Resolved': pd.date_range("2024-01-03", periods=rows, freq="min").strftime("%d/%m/%Y %H:%M"),
+        })
+        # Jira exports carry many columns this tool never reads
+        for name in ["Assignee", "Reporter", "Status", "Resolution", "Component/s", "Sprint"]:
+            export[name] = rng.choices([f"{name} {i}" for i in range(50)], k=rows)
+        export.to_excel(path, index=False)
+        full = normalize_columns(read_excel(path))
+    full_size = full.memory_usage(deep=True).sum()
+    print(f"{rows} rows, all {len(full.columns)} columns as read: {full_size / 2**20:.1f} MiB")
+    for label, columns in [
+        ("word count", ['summary', 'issue key']),
+        ("filter", ['priority', 'custom field (category)', 'created', 'resolved']),
+        ("box plot", ['priority']),
+    ]:
+        typed = apply_schema(full[columns].copy())
+        size = typed.memory_usage(deep=True).sum()
+        print(f"{label:<10} {size / 2**20:7.1f} MiB ({full_size / size:.1f}x smaller)")
+
+
+def _categorized_frame(rows):
+    import pandas as pd
+    rng = random.Random(0)
+    return pd.DataFrame({
+        'issue key': [f"BUG-{i}" for i in range(rows)],
+        'summary': synthetic_summaries(rows),
+        'priority': rng.choices(["Blocker", "High", "Medium", "Low"], k=rows),
+        'created': pd.date_range("2024-01-01", periods=rows, freq="min"),
+        'resolved': pd.date_range("2024-01-03", periods=rows, freq="min"),
+        'days spent to resolve': [rng.randint(0, 200) for _ in range(rows)],
+    }), rng.choices(["UI", "API", "Data", "Performance", "Others"], k=rows)
+
+
+def _measure_write(rows, path, fmt):
+    # Runs in a fresh process; the peak is measured on top of the frame being written
+    import numpy as np
+    import pandas as pd
+    from report_writer import ReportWriter
+    df, categories = _categorized_frame(rows)
+    categories = np.array(categories, dtype=object)
+    before = _peak_memory()
+    start = time.perf_counter()
+    if fmt == "pandas":
+        # The previous approach: a filtered copy per sheet, formatted in memory by ExcelWriter
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+            for cat in sorted(set(categories)):
+                df[categories == cat].to_excel(writer, sheet_name=cat, index=False)
+    else:
+        with ReportWriter(path, fmt=fmt) as writer:
+            for cat in sorted(set(categories)):
+                writer.write_sheet(cat, df, rows=np.flatnonzero(categories == cat))
+    elapsed = time.perf_counter() - start
+    return elapsed, (_peak_memory() - before) if before is not None else None
+
+
+def bench_report_writer(rows=500000):
+    """Writes a categorized workbook with pandas.ExcelWriter and each ReportWriter format."""
+    import multiprocessing
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in ["pandas", "xlsx", "csv", "parquet"]:
+            path = os.path.join(directory, f"categorized_{fmt}" + (".xlsx" if fmt in ("pandas", "xlsx") else ""))
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                elapsed, peak = pool.submit(_measure_write, rows, path, fmt).result()
+            peak_text = f"{peak / 2**20:8.1f} MiB above the frame's own peak" if peak is not None else "peak n/a"
+            print(f"{rows} rows  {fmt:<8} {elapsed:8.2f} s  {peak_text}")
+
+
+def bench_resolution_period(rows=200000):
+    """Compares per-cell date parsing with the vectorized resolution period on a synthetic export."""
+    import pandas as pd
+    from resolution_column import add_resolution_period
+    rng = random.Random(0)
+    created = pd.Series(pd.date_range("2023-01-01", periods=rows, freq="7min"))
+    resolved = created + pd.to_timedelta([rng.randint(60, 90 * 24 * 60) for _ in range(rows)], unit="min")
+    # Jira's export format, e.g. "03/Feb/24 10:23 AM", as read from the xlsx
+    export = pd.DataFrame({'created': created.dt.strftime("%d/%b/%y %I:%M %p").astype(object),
+                           'resolved': resolved.dt.strftime("%d/%b/%y %I:%M %p").astype(object)})
+    export.loc[::50, 'resolved'] = None
+
+    def legacy(df):
+        convert_to_date = lambda value: pd.to_datetime(value, errors="coerce", dayfirst=True)
+        df["created"] = df["created"].apply(convert_to_date)
+        df["resolved"] = df["resolved"].apply(convert_to_date)
+        df["days spent to resolve"] = (df["resolved"] - df["created"]).dt.days
+        return df
+
+    start = time.perf_counter()
+    old = legacy(export.copy())
+    old_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = add_resolution_period(export.copy())
+    new_time = time.perf_counter() - start
+    same = old["days spent to resolve"].equals(new["days spent to resolve"])
+    print(f"{rows} rows  per-cell {old_time:8.2f} s  vectorized {new_time:8.3f} s  "
+          f"({old_time / new_time:.0f}x faster, same result: {same})")
+
+
+def bench_filter_engine(rows=200000, filters=10):
+    """Compares the dialog's former per-filter date parsing with FilterEngine on repeated filters."""
+    import numpy as np
+    import pandas as pd
+    from filter_engine import FilterEngine
+    from report_loader import apply_schema
+    rng = random.Random(0)
+    created = pd.Series(pd.date_range("2023-01-01", periods=rows, freq="7min"))
+    raw = pd.DataFrame({
+        'priority': rng.choices(["Blocker", "High", "Medium", "Low"], k=rows),
+        'custom field (category)': rng.choices(["UI", "API", "Data", "Performance", "Other"], k=rows),
+        'created': created.dt.strftime("%d/%m/%Y %H:%M").astype(object),
+        'resolved': (created + pd.Timedelta(days=3)).dt.strftime("%d/%m/%Y %H:%M").astype(object),
+    })
+    specs = [{'Priority': [priority], 'date_ranges': {'created': (f"01/{month:02d}/2023", f"28/{month:02d}/2023")}}
+             for priority, month in zip(["Blocker", "High", "Medium", "Low"] * filters, range(1, filters + 1))]
+
+    def legacy(spec):
+        mask = pd.Series([True] * len(raw))
+        mask &= raw['priority'].isin(spec['Priority'])
+        from_str, to_str = spec['date_ranges']['created']
+        mask &= pd.to_datetime(raw['created'], errors='coerce', dayfirst=True) >= pd.to_datetime(from_str, dayfirst=True)
+        mask &= pd.to_datetime(raw['created'], errors='coerce', dayfirst=True) <= pd.to_datetime(to_str, dayfirst=True)
+        return np.flatnonzero(mask.to_numpy())
+
+    start = time.perf_counter()
+    expected = [legacy(spec) for spec in specs]
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    engine = FilterEngine({"Sheet1": apply_schema(raw.copy())})
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    results = [engine.evaluate(spec).get("Sheet1", np.zeros(0, dtype=np.int64)) for spec in specs]
+    engine_time = time.perf_counter() - start
+    same = all(np.array_equal(a, b) for a, b in zip(expected, results))
+    print(f"{rows} rows, {len(specs)} filters  dialog {legacy_time:7.2f} s  "
+          f"engine {load_time:6.2f} s once + {engine_time * 1000:7.1f} ms  (same rows: {same})")
+
+
+BENCHMARKS = {
+    "tokenizer": bench_tokenizer,
+    "parallel": bench_parallel,
+    "ascii": bench_ascii_fast_path,
+    "backends": bench_backends,
+    "topk": bench_top_k,
+    "workbook": bench_workbook_cache,
+    "sidecar": bench_sidecar,
+    "excel": bench_excel_engines,
+    "loader": bench_report_loader,
+    "writer": bench_report_writer,
+    "resolution": bench_resolution_period,
+    "filter": bench_filter_engine,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis pipeline benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}")
+        BENCHMARKS[name]()
@@ -9,6 +9,7 @@ from sklearn.utils.class_weight import compute_class_weight
 from imblearn.over_sampling import SMOTE
 from imblearn.pipeline import Pipeline
 from sentence_transformers import SentenceTransformer
+from report_loader import load_report
 
 # Global variable to store the trained pipeline
 _trained_pipeline = None
@@ -21,8 +22,7 @@ def train_model(file_path, should_cancel=None):
     global _trained_pipeline
     try:
         # Initial data loading
-        df = pd.read_excel(file_path)
-        df.columns = [col.lower() for col in df.columns]
+        df = load_report(file_path, ['summary', 'category'], sheet_name=0)
 
         if should_cancel and should_cancel():
             return False, "Training canceled by user"
@@ -32,7 +32,8 @@ def train_model(file_path, should_cancel=None):
             return False, "The selected file does not contain both 'Summary' and 'Category' columns."
 
         df.dropna(subset=['summary', 'category'], inplace=True)
-        y = df['category']
+        # Plain labels for scikit-learn rather than the categorical dtype
+        y = df['category'].astype(object)
 
         # Text embedding
         model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2')
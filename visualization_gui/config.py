@@ -28,4 +28,41 @@ dropdown_padding = (5, 2)
 
 # Options
 top_n_options = [("Top 10", 10), ("Top 20", 20), ("Top 40", 40), 
-                 ("Top 60", 60), ("Top 80", 80), ("Top 100", 100)]
\ No newline at end of file
+                 ("Top 60", 60), ("Top 80", 80), ("Top 100", 100)]
+
+# Text processing
+tokenizer_backend = "mecab-ipadic"  # Japanese tokenizer: mecab-ipadic, fugashi-unidic or ngram
+token_cache_size = 100000       # Summaries memoized by the tokenizer (0 disables the cache)
+tokenizer_workers = None        # Worker processes for large sheets (None uses all CPU cores)
+tokenizer_chunk_size = 2000     # Summaries sent to a worker at a time
+parallel_min_rows = 20000       # Smaller inputs are tokenized in-process
+lemma_cache_size = 50000        # Distinct English words kept in the lemma table
+lemma_cache_path = None         # JSON file to persist the lemma table between runs (None keeps it in memory)
+persistent_token_cache_path = None          # SQLite file caching tokens across runs (None disables it)
+persistent_token_cache_max_entries = 2000000
+persistent_token_cache_batch_size = 50000   # Summaries looked up in the persistent cache at a time
+word_count_streaming = True     # Read only the summary column, row by row, when counting words
+word_count_sheet_workers = None # Worker processes counting sheets in parallel (None uses all CPU cores)
+all_categories_sheet = "All Categories"  # Combined sheet written by word count for multi-sheet reports
+issue_key_column = "issue key"  # Identifies defect reports for incremental word count updates
+word_count_top_k_capacity = None  # Words kept per sheet in approximate top-K mode (None counts every word exactly)
+word_count_ngram_sizes = ()      # Also write top n-gram sheets for these n, e.g. (2, 3)
+word_count_cooccurrence = False  # Also write a sheet of word pairs appearing in the same summary
+
+# Excel loading
+excel_reader_engine = "auto"     # auto (calamine if installed, else openpyxl), calamine or openpyxl
+workbook_cache_max_bytes = 512 * 1024 * 1024  # Memory budget for parsed sheets kept in memory by the GUI
+sidecar_cache_dir = os.path.join(os.path.expanduser("~"), ".visualization_gui", "sidecars")  # Parquet copies of parsed sheets (None disables them)
+sidecar_cache_max_bytes = 2 * 1024 * 1024 * 1024  # Disk budget for sidecars; the least recently opened reports are removed first
+sidecar_cache_max_age_days = 30  # Sidecars of reports not opened for this many days are removed (None keeps them)
+
+# Output
+output_format = "xlsx"           # xlsx, csv or parquet; csv/parquet write one file per sheet into a folder
+output_chunk_rows = 10000        # Rows converted at a time when writing filtered, categorized and resolution reports
+filter_preset_workers = None     # Threads writing filter preset outputs (None: one per preset, up to the CPU count)
+resolution_sheet_workers = None  # Worker processes adding the resolution period to several sheets (None uses all CPU cores)
+
+# Resolution metrics
+business_holidays_path = None    # Holiday calendar for business days, one date per line (e.g. the Cabinet Office's syukujitsu.csv)
+business_weekmask = "1111100"    # Working days, Monday to Sunday
+business_hours = None            # Working hours as (start, end), e.g. (9, 18), to also compute business hours to resolve
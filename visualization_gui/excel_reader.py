@@ -0,0 +1,73 @@
+"""
+Excel reading behind one interface, so callers never choose an engine.
+
+With excel_reader_engine = "auto" (config.py), calamine (the Rust-based
+python-calamine package) is used when it is installed, since it parses
+.xlsx several times faster than openpyxl; otherwise openpyxl is used.
+Both return the same DataFrames, so nothing downstream depends on the
+engine. Compare them with `python benchmarks.py excel`.
+"""
+import importlib.util
+import os
+import pandas as pd
+from config import excel_reader_engine
+
+ENGINES = ("calamine", "openpyxl")
+OPENPYXL_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+def calamine_available():
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def get_engine(engine=None):
+    """Resolves "auto" (or the configured engine) to the engine that will be used."""
+    engine = engine or excel_reader_engine
+    if engine == "auto":
+        return "calamine" if calamine_available() else "openpyxl"
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown Excel reader engine '{engine}'. Available: auto, {', '.join(ENGINES)}")
+    return engine
+
+
+def _pandas_engine(path, engine):
+    engine = get_engine(engine)
+    if engine == "openpyxl" and not str(path).lower().endswith(OPENPYXL_EXTENSIONS):
+        # Let pandas pick the reader for other formats such as .xls
+        return None
+    return engine
+
+
+def open_workbook(path, engine=None):
+    """Returns a pandas ExcelFile; use it as a context manager so the file is closed."""
+    return pd.ExcelFile(path, engine=_pandas_engine(path, engine))
+
+
+def read_excel(path, engine=None, **kwargs):
+    return pd.read_excel(path, engine=_pandas_engine(path, engine), **kwargs)
+
+
+def iter_sheet_rows(path, sheet_name, engine=None):
+    """
+    Yields the rows of one sheet as tuples of cell values, header first, with
+    None for empty cells. openpyxl streams the sheet; calamine loads it into
+    compact native cells first, which is still far smaller than a DataFrame.
+    Close the generator (e.g. with contextlib.closing) if it is not exhausted.
+    """
+    if get_engine(engine) == "calamine":
+        from python_calamine import CalamineWorkbook
+        workbook = CalamineWorkbook.from_path(os.fspath(path))
+        try:
+            for row in workbook.get_sheet_by_name(sheet_name).iter_rows():
+                yield tuple(None if value == "" else value for value in row)
+        finally:
+            close = getattr(workbook, "close", None)
+            if close:
+                close()
+    else:
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook[sheet_name].iter_rows(values_only=True)
+        finally:
+            workbook.close()
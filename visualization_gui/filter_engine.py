@@ -0,0 +1,156 @@
+"""
+GUI-independent filtering of defect reports.
+
+FilterEngine loads a report once and keeps, per sheet, the integer codes of
+each category column and the parsed date columns, typed as the report
+loader types them. Matching rows are written with the report's own values
+and only the date columns parsed, as the dialog always wrote them. A filter spec is the dict MultiFilterDialog returns:
+
+    {"Priority": ["High", "Blocker"],
+     "Custom field (Category)": ["UI"],
+     "date_ranges": {"created": ("01/01/2024", "31/03/2024")}}
+
+Values are matched as text and dates are read day first. The spec is
+compiled once by compile_spec (value sets to codes, bounds to datetime64) and evaluated with
+vectorized comparisons. As in the dialog, a filter is ignored on sheets
+without its column. An engine lives only as long as its caller holds it
+(a dialog or a preset run); reloading a report is served by the bounded
+workbook cache.
+"""
+import numpy as np
+import pandas as pd
+from report_loader import apply_schema
+from report_writer import ReportWriter, get_output_path
+from workbook_cache import read_workbook
+
+# Filter columns, named as in MultiFilterDialog
+CATEGORY_COLUMNS = ["Priority", "Custom field (Category)"]
+DATE_COLUMNS = ["created", "resolved"]
+
+
+def parse_bound(value):
+    """A date range bound as datetime64 (NaT if invalid), or None when blank."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return pd.to_datetime(value, errors='coerce', dayfirst=True).to_datetime64()
+
+
+def compile_spec(spec):
+    """Turns a spec into ({column: wanted labels as text}, {column: (lower, upper)})."""
+    value_sets = {col: {str(value) for value in spec[col]} for col in CATEGORY_COLUMNS if spec.get(col)}
+    bounds = {}
+    for col, (from_value, to_value) in (spec.get('date_ranges') or {}).items():
+        lower, upper = parse_bound(from_value), parse_bound(to_value)
+        if lower is not None or upper is not None:
+            bounds[col] = (lower, upper)
+    return value_sets, bounds
+
+
+def category_mask(labels, codes, wanted):
+    """Rows whose code points to a label in wanted (a set of texts)."""
+    wanted_codes = np.flatnonzero([str(label) in wanted for label in labels])
+    return np.isin(codes, wanted_codes)
+
+
+def date_mask(dates, lower, upper):
+    """Rows with dates within the compiled bounds; missing dates never match a bound."""
+    mask = np.ones(len(dates), dtype=bool)
+    if lower is not None:
+        mask &= dates >= lower
+    if upper is not None:
+        mask &= dates <= upper
+    return mask
+
+
+class FilterEngine:
+    def __init__(self, sheets, typed_sheets=None):
+        # Frames written out; filters are evaluated on typed_sheets (by default the same)
+        self.sheets = sheets
+        # sheet -> column -> (category labels, per-row codes with -1 for blanks)
+        self.codes = {}
+        # sheet -> column -> per-row datetime64 values
+        self.dates = {}
+        for name, df in (typed_sheets or sheets).items():
+            self.codes[name] = {}
+            for col in CATEGORY_COLUMNS:
+                if col.lower() in df.columns:
+                    values = df[col.lower()]
+                    if not isinstance(values.dtype, pd.CategoricalDtype):
+                        values = values.astype("category")
+                    self.codes[name][col] = (values.cat.categories, values.cat.codes.to_numpy())
+            self.dates[name] = {col: df[col].to_numpy() for col in DATE_COLUMNS if col in df.columns}
+
+    @classmethod
+    def load(cls, input_excel):
+        sheets = read_workbook(input_excel)
+        typed_sheets = {name: apply_schema(df.copy(deep=False)) for name, df in sheets.items()}
+        # Other typed columns (e.g. day counts read as numbers) would turn text cells into blanks
+        for name, df in sheets.items():
+            for col in DATE_COLUMNS:
+                if col in df.columns:
+                    df[col] = typed_sheets[name][col]
+        return cls(sheets, typed_sheets)
+
+    def filter_columns(self):
+        return [col for col in CATEGORY_COLUMNS if any(col in codes for codes in self.codes.values())]
+
+    def date_columns(self):
+        return [col for col in DATE_COLUMNS if any(col in dates for dates in self.dates.values())]
+
+    def unique_values(self):
+        """Values present in each category column across all sheets, sorted, for MultiFilterDialog."""
+        unique_values = {}
+        for col in self.filter_columns():
+            # Labels of the codes each sheet uses, deduplicated once across sheets
+            observed = [labels[np.unique(codes[codes >= 0])] for labels, codes in
+                        (sheet_codes[col] for sheet_codes in self.codes.values() if col in sheet_codes)]
+            values = pd.unique(np.concatenate([np.asarray(labels, dtype=object) for labels in observed]))
+            try:
+                unique_values[col] = sorted(values)
+            except TypeError:
+                # Numbers mixed with text
+                unique_values[col] = sorted(values, key=str)
+        return unique_values
+
+    def mask(self, sheet_name, compiled):
+        """Boolean row mask of one sheet for a compiled spec."""
+        value_sets, bounds = compiled
+        mask = np.ones(len(self.sheets[sheet_name]), dtype=bool)
+        for col, wanted in value_sets.items():
+            if col in self.codes[sheet_name]:
+                mask &= category_mask(*self.codes[sheet_name][col], wanted)
+        for col, (lower, upper) in bounds.items():
+            if col in self.dates[sheet_name]:
+                mask &= date_mask(self.dates[sheet_name][col], lower, upper)
+        return mask
+
+    def evaluate(self, spec):
+        """{sheet name: positions of the matching rows}, for sheets with any match."""
+        compiled = compile_spec(spec)
+        matches = {}
+        for name in self.sheets:
+            rows = np.flatnonzero(self.mask(name, compiled))
+            if len(rows):
+                matches[name] = rows
+        return matches
+
+    def write(self, matches, output_path):
+        """Streams the matching rows of each sheet to output_path."""
+        with ReportWriter(output_path) as writer:
+            for name, rows in matches.items():
+                writer.write_sheet(name, self.sheets[name], rows=rows)
+        return output_path
+
+
+def filter_report(input_excel, spec, output_path=None, engine=None):
+    """
+    Writes the rows of input_excel matching spec to output_path (by default
+    <report>_filtered.xlsx). Pass the engine already loaded for input_excel,
+    if any. Returns (output path, success, message).
+    """
+    engine = engine or FilterEngine.load(input_excel)
+    matches = engine.evaluate(spec)
+    if not matches:
+        return None, False, "No defect reports found with the selected filters."
+    output_path = output_path or get_output_path(input_excel, "_filtered")
+    return engine.write(matches, output_path), True, None
@@ -0,0 +1,162 @@
+"""
+Named filter presets, evaluated together against one loaded report.
+
+A preset file (JSON, or YAML with .yaml/.yml) lists filter specs in the
+format of filter_engine, each with a name:
+
+    output: files            # files (one per preset) or sheets (one workbook)
+    presets:
+      - name: High priority
+        Priority: [Blocker, High]
+      - name: 2024 Q1
+        date_ranges:
+          created: ["01/01/2024", "31/03/2024"]
+
+A bare list of presets is accepted too. The report is read once; each
+preset is then only a mask evaluation. Separate files (<report>_preset_<name>)
+are written in parallel threads; one workbook is <report>_presets.
+
+    python filter_presets.py report.xlsx presets.yaml [--sheets]
+"""
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from config import filter_preset_workers
+from filter_engine import CATEGORY_COLUMNS, FilterEngine
+from report_writer import ReportWriter, get_output_path
+
+OUTPUT_MODES = ("files", "sheets")
+_PRESET_KEYS = {col.lower(): col for col in CATEGORY_COLUMNS}
+
+
+def _date_range(bounds):
+    # [from, to], [from] or a single date; missing bounds are open
+    bounds = [bounds] if isinstance(bounds, str) or bounds is None else list(bounds)
+    if len(bounds) > 2:
+        raise ValueError(f"A date range has at most two dates (from, to): {bounds!r}")
+    return tuple(bounds) + ("",) * (2 - len(bounds))
+
+
+def _normalize_preset(preset):
+    # Filter columns may be written in any case, e.g. "priority"
+    if not isinstance(preset, dict) or not preset.get("name"):
+        raise ValueError(f"Each preset needs a name: {preset!r}")
+    spec = {"name": str(preset["name"])}
+    for key, value in preset.items():
+        if key == "name":
+            continue
+        if key.lower() == "date_ranges":
+            spec["date_ranges"] = {col.lower(): _date_range(bounds) for col, bounds in (value or {}).items()}
+        elif key.lower() in _PRESET_KEYS:
+            spec[_PRESET_KEYS[key.lower()]] = value if isinstance(value, list) else [value]
+        else:
+            allowed = ", ".join(CATEGORY_COLUMNS + ["date_ranges"])
+            raise ValueError(f"Unknown filter '{key}' in preset '{spec['name']}'. Available: {allowed}")
+    return spec
+
+
+def load_presets(path):
+    """Reads a preset file; returns (presets, output mode)."""
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            import yaml
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, list):
+        data = {"presets": data}
+    mode = data.get("output", "files")
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output '{mode}'. Available: {', '.join(OUTPUT_MODES)}")
+    presets = [_normalize_preset(preset) for preset in data.get("presets") or []]
+    names = [preset["name"] for preset in presets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate preset names: {', '.join(duplicates)}")
+    if not presets:
+        raise ValueError(f"No presets found in {path}")
+    return presets, mode
+
+
+def _file_suffixes(preset_names):
+    # <report>_preset_<name>, so no preset (e.g. one named "filtered") can
+    # overwrite another tool's output. Names that only differ in characters
+    # not allowed in file names (e.g. "A/B" and "A B") or in case would share
+    # a file; number the later ones
+    suffixes, used = {}, set()
+    for preset_name in preset_names:
+        base = "_preset_" + re.sub(r'[\\/:*?"<>|\s]+', "_", preset_name).strip("_")
+        suffix, n = base, 2
+        while suffix.lower() in used:
+            suffix = f"{base}_{n}"
+            n += 1
+        used.add(suffix.lower())
+        suffixes[preset_name] = suffix
+    return suffixes
+
+
+def _sheet_names(preset_name, matches, multi_sheet, used):
+    # One sheet per matching report sheet, named after the preset (and the report sheet)
+    names = {}
+    for sheet_name in matches:
+        base = f"{preset_name} - {sheet_name}" if multi_sheet else preset_name
+        base = re.sub(r"[\[\]:*?/\\]", "_", base)[:31]
+        name, n = base, 2
+        while name.lower() in used:
+            name = f"{base[:31 - len(str(n)) - 3]} ({n})"
+            n += 1
+        used.add(name.lower())
+        names[sheet_name] = name
+    return names
+
+
+def run_presets(input_excel, presets, mode="files", workers=None):
+    """
+    Evaluates every preset against one load of input_excel and writes the
+    matches. Returns [(preset name, output path or None, message)].
+    """
+    engine = FilterEngine.load(input_excel)
+    matches = [(preset["name"], engine.evaluate(preset)) for preset in presets]
+    if not any(preset_matches for _, preset_matches in matches):
+        return [(name, None, "No defect reports found.") for name, _ in matches]
+    if mode == "sheets":
+        results = []
+        output_path = get_output_path(input_excel, "_presets")
+        multi_sheet = len(engine.sheets) > 1
+        used = set()
+        with ReportWriter(output_path) as writer:
+            for name, preset_matches in matches:
+                if not preset_matches:
+                    results.append((name, None, "No defect reports found."))
+                    continue
+                sheet_names = _sheet_names(name, preset_matches, multi_sheet, used)
+                for sheet_name, rows in preset_matches.items():
+                    writer.write_sheet(sheet_names[sheet_name], engine.sheets[sheet_name], rows=rows)
+                results.append((name, output_path, f"{sum(map(len, preset_matches.values()))} defect reports"))
+        return results
+
+    suffixes = _file_suffixes(name for name, _ in matches)
+
+    def write(name, preset_matches):
+        if not preset_matches:
+            return name, None, "No defect reports found."
+        output_path = engine.write(preset_matches, get_output_path(input_excel, suffixes[name]))
+        return name, output_path, f"{sum(map(len, preset_matches.values()))} defect reports"
+
+    workers = workers or filter_preset_workers or min(len(matches), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(write, name, preset_matches) for name, preset_matches in matches]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write filtered defect reports for every preset in a preset file.")
+    parser.add_argument("report", help="Defect report (.xlsx)")
+    parser.add_argument("presets", help="Preset file (.json, .yaml or .yml)")
+    parser.add_argument("--sheets", action="store_true", help="Write one workbook with a sheet per preset")
+    args = parser.parse_args()
+    presets, mode = load_presets(args.presets)
+    for name, path, message in run_presets(args.report, presets, "sheets" if args.sheets else mode):
+        print(f"{name}: {message}" + (f" -> {path}" if path else ""))
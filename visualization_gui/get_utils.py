@@ -1,8 +1,7 @@
-import pandas as pd
+from workbook_cache import get_workbook_cache
 
 def get_sheet_names(file_path):
-    xls = pd.ExcelFile(file_path)
-    return xls.sheet_names
+    return get_workbook_cache().sheet_names(file_path)
 
 def get_save_path(base_path, sheet_names, sheet_name, suffix):
     # If only one sheet, do not include sheet name in file name
@@ -7,9 +7,11 @@ from config import (
     success_color, error_color, text_color, light_text, highlight_color,
     card_bg, border_color, header_font, button_font, 
     small_button_font, label_font, button_padding,
-    frame_padding, section_padding, top_n_options
+    frame_padding, section_padding, top_n_options, word_count_streaming,
+    all_categories_sheet, word_count_top_k_capacity, word_count_ngram_sizes,
+    word_count_cooccurrence
 )
-from get_utils import get_sheet_names, get_save_path
+from get_utils import get_save_path
 
 
 class VisualizationApp(tk.Tk):
@@ -114,6 +116,7 @@ class VisualizationApp(tk.Tk):
         sections = [
             ("Data Preparation", [
                 ("Filter Defect Report", self.filter_defect_reports),
+                ("Run Filter Presets", self.run_filter_presets),
                 ("Add Resolution Period", self.add_resolution_period_column)
             ]),
             ("Categorization", [
@@ -127,7 +130,9 @@ class VisualizationApp(tk.Tk):
                 ("Generate DefectType Bar Plot", self.generate_defecttype_category_bar_plot)
             ]),
             ("Text Analysis", [
-                ("Generate Word Count Table", self.generate_wordcount_table)
+                ("Generate Word Count Table", self.generate_wordcount_table),
+                ("Update Word Count Table", self.update_wordcount_table),
+                ("Filtered Word Count Table", self.filtered_wordcount_table)
             ])
         ]
         
@@ -377,12 +382,42 @@ class VisualizationApp(tk.Tk):
                 messagebox.showinfo("Filtered Results Saved", f"Filtered defect report saved to:\n{output_path}")
                 os.startfile(output_path)
             else:
+                # The dialog has already told the user why nothing was saved
                 self.status_bar.config(text="Filtering canceled")
-                messagebox.showinfo("Canceled", "Filtering canceled.")
         except Exception as e:
             self.status_bar.config(text="Failed to filter defect report")
             messagebox.showerror("Error", f"Failed to filter defect report:\n{str(e)}")
 
+    def run_filter_presets(self):
+        self.status_bar.config(text="Selecting defect report to filter...")
+        file_path = filedialog.askopenfilename(
+            title="Select a Defect Report to Filter",
+            filetypes=[("Excel Files", "*.xlsx;*.xls")]
+        )
+        if not file_path:
+            self.status_bar.config(text="Filtering canceled")
+            return
+        preset_path = filedialog.askopenfilename(
+            title="Select a Filter Preset File",
+            filetypes=[("Preset Files", "*.json;*.yaml;*.yml")]
+        )
+        if not preset_path:
+            self.status_bar.config(text="Filtering canceled")
+            return
+
+        try:
+            self.status_bar.config(text="Filtering a defect report with presets...")
+            from filter_presets import load_presets, run_presets
+            presets, mode = load_presets(preset_path)
+            results = run_presets(file_path, presets, mode)
+            lines = [f"{name}: {message}" for name, _, message in results]
+            output_paths = sorted({path for _, path, _ in results if path})
+            self.status_bar.config(text=f"Filter presets applied ({len(output_paths)} file(s) saved)")
+            messagebox.showinfo("Filter Presets", "\n".join(lines) + "\n\nSaved to:\n" + "\n".join(output_paths or ["(nothing)"]))
+        except Exception as e:
+            self.status_bar.config(text="Failed to apply filter presets")
+            messagebox.showerror("Error", f"Failed to apply filter presets:\n{str(e)}")
+
     def add_resolution_period_column(self):
         self.status_bar.config(text="Selecting defect report to add resolution period...")
         file_path = filedialog.askopenfilename(
@@ -396,9 +431,10 @@ class VisualizationApp(tk.Tk):
         try:
             self.status_bar.config(text="Adding resolution period column...")
             from resolution_column import add_resolution_period_column_logic
-            output_path = add_resolution_period_column_logic(file_path)
+            output_path, summary_path = add_resolution_period_column_logic(file_path)
             self.status_bar.config(text="Resolution period added successfully")
-            messagebox.showinfo("Success", f"Defect report with resolution period column saved to:\n{output_path}")
+            messagebox.showinfo("Success", f"Defect report with resolution period column saved to:\n{output_path}\n\n"
+                                           f"Resolution percentiles (median, P90, P99) saved to:\n{summary_path}")
             os.startfile(output_path)
         except Exception as e:
             self.status_bar.config(text="Failed to add resolution period")
@@ -634,13 +670,14 @@ class VisualizationApp(tk.Tk):
             return
             
         self.status_bar.config(text="Checking priorities...")
-        import pandas as pd
         try:
-            excel_data = pd.read_excel(file_path, sheet_name=None)
+            from report_loader import load_report
+            from resolution_column import RESOLUTION_METRICS
+            excel_data = load_report(file_path, ['priority'] + list(RESOLUTION_METRICS))
+            metrics = [metric for metric in RESOLUTION_METRICS if any(metric in df.columns for df in excel_data.values())]
             priorities = set()
             has_priority = False
             for df in excel_data.values():
-                df.columns = [col.lower() for col in df.columns]
                 if "priority" in df.columns:
                     has_priority = True
                     priorities.update(str(p) for p in df["priority"].dropna().unique())
@@ -648,7 +685,30 @@ class VisualizationApp(tk.Tk):
         except Exception:
             priorities = []
             has_priority = False
-            
+            metrics = []
+
+        # Choose the metric when the report has business days/hours as well as calendar days
+        metric = "days spent to resolve"
+        if len(metrics) > 1:
+            dialog = tk.Toplevel(self)
+            dialog.title("Select Metric")
+            dialog.grab_set()
+            tk.Label(dialog, text="Select the resolution metric to plot:", font=label_font).pack(pady=10, padx=20)
+            metric_var = tk.StringVar(value=metrics[0])
+            for m in metrics:
+                tk.Radiobutton(dialog, text=RESOLUTION_METRICS[m], variable=metric_var, value=m,
+                               font=small_button_font).pack(anchor='w', padx=20)
+            dialog.selected = None
+            def on_metric_ok():
+                dialog.selected = metric_var.get()
+                dialog.destroy()
+            tk.Button(dialog, text="OK", command=on_metric_ok).pack(pady=15)
+            self.wait_window(dialog)
+            if dialog.selected is None:
+                self.status_bar.config(text="Box plot generation canceled")
+                return
+            metric = dialog.selected
+
         selected_priorities = []
         if has_priority and priorities:
             # Multi-select dialog using checkboxes
@@ -700,7 +760,7 @@ class VisualizationApp(tk.Tk):
         try:
             self.status_bar.config(text="Generating box plot...")
             from plots import generate_category_box_plot
-            success, output_path, msg = generate_category_box_plot(file_path, selected_priorities)
+            success, output_path, msg = generate_category_box_plot(file_path, selected_priorities, metric)
             if success:
                 self.status_bar.config(text="Box plot generated successfully")
                 messagebox.showinfo("Box Plot Saved", f"Box plot saved as:\n{output_path}")
@@ -765,7 +825,10 @@ class VisualizationApp(tk.Tk):
         
         self.status_bar.config(text="Filtering a defect report...")
         from word_count_util import word_count
-        output_path, success, message = word_count(file_path)
+        output_path, success, message = word_count(
+            file_path, streaming=word_count_streaming, top_k_capacity=word_count_top_k_capacity,
+            ngram_sizes=word_count_ngram_sizes, cooccurrence=word_count_cooccurrence
+        )
         if not success:
             self.status_bar.config(text="Failed to generate a word count table")
             messagebox.showerror("Error", message)
@@ -774,6 +837,76 @@ class VisualizationApp(tk.Tk):
         messagebox.showinfo("Word Count Saved", f"Word count Excel file saved to:\n{output_path}")
         os.startfile(output_path)
 
+    def update_wordcount_table(self):
+        self.status_bar.config(text="Selecting word count table to update...")
+        wordcount_path = filedialog.askopenfilename(
+            title="Select a Word Count Table to Update",
+            filetypes=[("Excel files", "*wordcount*.xlsx")]
+        )
+        if not wordcount_path:
+            self.status_bar.config(text="Word count update canceled")
+            return
+        file_path = filedialog.askopenfilename(
+            title="Select Defect Report with New Defects",
+            filetypes=[("Excel files", "*.xlsx")]
+        )
+        if not file_path:
+            self.status_bar.config(text="Word count update canceled")
+            return
+
+        try:
+            self.status_bar.config(text="Updating word count table...")
+            from word_count_util import update_word_count
+            output_path, success, message = update_word_count(wordcount_path, file_path, streaming=word_count_streaming)
+            if not success:
+                self.status_bar.config(text="Word count table not updated")
+                messagebox.showinfo("Not Updated", message)
+                return
+            self.status_bar.config(text="Word count table updated successfully")
+            messagebox.showinfo("Word Count Updated", f"Word count Excel file updated:\n{output_path}"
+                                + (f"\n\n{message}" if message else ""))
+            os.startfile(output_path)
+        except Exception as e:
+            self.status_bar.config(text="Failed to update word count table")
+            messagebox.showerror("Error", f"Failed to update word count table:\n{str(e)}")
+
+    def filtered_wordcount_table(self):
+        self.status_bar.config(text="Selecting defect report for filtered word count...")
+        file_path = filedialog.askopenfilename(
+            title="Select Defect Report for Filtered Word Count",
+            filetypes=[("Excel files", "*.xlsx;*.xls")]
+        )
+        if not file_path:
+            self.status_bar.config(text="Filtered word count canceled")
+            return
+
+        try:
+            self.status_bar.config(text="Loading report index...")
+            from report_index import get_report_index, filtered_word_count
+            from filter_defect_reports import MultiFilterDialog
+            index = get_report_index(file_path)
+            columns_values = index.unique_values()
+            date_columns = index.date_columns()
+            if not columns_values and not date_columns:
+                self.status_bar.config(text="Filtered word count canceled")
+                messagebox.showerror("No Filter Column", "There is no column to filter the defect reports (must have 'Priority', 'Custom field (Category)', 'Created', or 'Resolved').")
+                return
+            dialog = MultiFilterDialog(self, columns_values, date_columns)
+            if not dialog.selected:
+                self.status_bar.config(text="Filtered word count canceled")
+                return
+            output_path, success, message = filtered_word_count(file_path, dialog.selected)
+            if not success:
+                self.status_bar.config(text="No filtered word count generated")
+                messagebox.showinfo("No Results", message)
+                return
+            self.status_bar.config(text="Filtered word count table generated successfully")
+            messagebox.showinfo("Word Count Saved", f"Filtered word count Excel file saved to:\n{output_path}")
+            os.startfile(output_path)
+        except Exception as e:
+            self.status_bar.config(text="Failed to generate filtered word count table")
+            messagebox.showerror("Error", f"Failed to generate filtered word count table:\n{str(e)}")
+
     def select_excel_file(self):
         self.status_bar.config(text="Selecting word count table...")
         file_path = filedialog.askopenfilename(
@@ -786,17 +919,18 @@ class VisualizationApp(tk.Tk):
             
         self.selected_excel_file = file_path
         try:
-            self.status_bar.config(text="Loading sheet names...")
-            sheet_names = get_sheet_names(self.selected_excel_file)
+            self.status_bar.config(text="Loading word count table...")
+            import pandas as pd
+            from workbook_cache import get_workbook_cache, read_workbook, read_sheet
+            workbook_cache = get_workbook_cache()
+            sheet_names = workbook_cache.sheet_names(self.selected_excel_file)
             self.sheet_names_global = sheet_names
             self._missing_col_error_shown_per_sheet = {}  # Track error per sheet
 
-            import pandas as pd
             # Check first sheet for required columns before proceeding
             first_sheet = sheet_names[0] if sheet_names else None
             if first_sheet:
-                df_first = pd.read_excel(self.selected_excel_file, sheet_name=first_sheet)
-                df_first.columns = [col.lower() for col in df_first.columns]
+                df_first = read_sheet(self.selected_excel_file, first_sheet)
                 if "word" not in df_first.columns or "count" not in df_first.columns:
                     self.status_bar.config(text="File not loaded")
                     messagebox.showerror("Error", "The first sheet does not contain both 'Word' and 'Count' columns.")
@@ -808,15 +942,24 @@ class VisualizationApp(tk.Tk):
                 if widget != self.btn_select_file:  # Keep the select button
                     widget.destroy()
 
+            # Parse the other sheets in the background so switching categories is served from the cache
+            if len(sheet_names) > 1:
+                workbook_cache.prefetch(self.selected_excel_file)
+
+            # Word count tables written by this tool already hold a combined sheet
+            has_combined_sheet = all_categories_sheet in sheet_names
+
             # Only show sheet selection if there are multiple sheets
             if len(sheet_names) > 1:
                 # Category options
-                option_names = sheet_names + ['All Categories']
+                option_names = sheet_names if has_combined_sheet else sheet_names + [all_categories_sheet]
 
-                # Remove previous OptionMenu if it exists
+                # Remove previous OptionMenu and its traces if they exist
                 if self.sheet_menu:
                     self.sheet_menu.destroy()
                     self.sheet_menu = None
+                for modes, callback in self.selected_sheet.trace_info():
+                    self.selected_sheet.trace_remove(modes, callback)
 
                 self.selected_sheet.set(option_names[0])
 
@@ -840,13 +983,10 @@ class VisualizationApp(tk.Tk):
                         text=f"File: {os.path.basename(self.selected_excel_file)}"
                     )
                     try:
-                        import pandas as pd
-                        if selected == 'All Categories':
-                            # Read all sheets and concatenate
+                        if selected == all_categories_sheet and not has_combined_sheet:
+                            # Older tables: concatenate all sheets
                             all_dfs = []
-                            excel_data = pd.read_excel(self.selected_excel_file, sheet_name=None)
-                            for sheet, df in excel_data.items():
-                                df.columns = [col.lower() for col in df.columns]
+                            for sheet, df in read_workbook(self.selected_excel_file).items():
                                 if "word" in df.columns and "count" in df.columns:
                                     all_dfs.append(df[["word", "count"]])
                             if all_dfs:
@@ -862,9 +1002,8 @@ class VisualizationApp(tk.Tk):
                                     self._missing_col_error_shown_per_sheet['All Categories'] = True
                                 self.df = None
                         else:
-                            self.df = pd.read_excel(self.selected_excel_file, sheet_name=selected)
+                            self.df = read_sheet(self.selected_excel_file, selected)
                             sheet = selected
-                            self.df.columns = [col.lower() for col in self.df.columns]
                             if "word" not in self.df.columns or "count" not in self.df.columns:
                                 if not self._missing_col_error_shown_per_sheet.get(sheet, False):
                                     messagebox.showerror("Missing Columns", "The selected sheet does not contain both 'Word' and 'Count' columns.")
@@ -876,8 +1015,6 @@ class VisualizationApp(tk.Tk):
                         messagebox.showerror("Error", f"Failed to read sheet:\n{str(e)}")
                         self.df = None
 
-                self.selected_sheet.trace_add('write', update_label)
-
                 # Update sheet data display when sheet changes
                 def update_sheet_data_and_display(*args):
                     update_label()
@@ -887,11 +1024,9 @@ class VisualizationApp(tk.Tk):
             # Load data (for single sheet or default selection)
             if len(sheet_names) > 1:
                 selected = self.selected_sheet.get()
-                if selected == 'All Categories':
+                if selected == all_categories_sheet and not has_combined_sheet:
                     all_dfs = []
-                    excel_data = pd.read_excel(self.selected_excel_file, sheet_name=None)
-                    for sheet, df in excel_data.items():
-                        df.columns = [col.lower() for col in df.columns]
+                    for sheet, df in read_workbook(self.selected_excel_file).items():
                         if "word" in df.columns and "count" in df.columns:
                             all_dfs.append(df[["word", "count"]])
                     if all_dfs:
@@ -901,12 +1036,10 @@ class VisualizationApp(tk.Tk):
                     else:
                         self.df = None
                 else:
-                    self.df = pd.read_excel(self.selected_excel_file, sheet_name=selected)
-                    self.df.columns = [col.lower() for col in self.df.columns]
+                    self.df = read_sheet(self.selected_excel_file, selected)
             else:
                 # Single sheet - load it directly
-                self.df = pd.read_excel(self.selected_excel_file)
-                self.df.columns = [col.lower() for col in self.df.columns]
+                self.df = df_first if first_sheet else None
 
             # Validate columns
             if self.df is not None and ("word" not in self.df.columns or "count" not in self.df.columns):
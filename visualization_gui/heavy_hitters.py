@@ -0,0 +1,113 @@
+"""
+Bounded-memory approximate word counting for top-N tables.
+
+SpaceSaving keeps at most `capacity` words. Every reported count is an upper
+bound that overestimates the true count by at most that word's `error`, and
+error never exceeds total / capacity. Any word whose true count is above
+total / capacity is guaranteed to be kept.
+"""
+import heapq
+import math
+import pandas as pd
+
+
+class SpaceSaving:
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        # Min-heap of (count, word); stale entries are skipped when popped
+        self._heap = []
+
+    @classmethod
+    def for_error(cls, epsilon):
+        """Creates a summary whose overestimate is at most epsilon * total."""
+        return cls(math.ceil(1 / epsilon))
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __bool__(self):
+        return bool(self._counts)
+
+    @property
+    def error_bound(self):
+        """Guaranteed maximum overestimate of any reported count."""
+        if len(self._counts) < self.capacity:
+            return 0
+        return self.total // self.capacity
+
+    def update(self, words):
+        for word in words:
+            self.add(word)
+
+    def add(self, word, count=1):
+        self.total += count
+        counts = self._counts
+        if word in counts:
+            counts[word] += count
+        elif len(counts) < self.capacity:
+            counts[word] = count
+            self._errors[word] = 0
+        else:
+            min_count, victim = self._pop_min()
+            del counts[victim]
+            del self._errors[victim]
+            counts[word] = min_count + count
+            self._errors[word] = min_count
+        heapq.heappush(self._heap, (counts[word], word))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _pop_min(self):
+        while True:
+            count, word = heapq.heappop(self._heap)
+            if self._counts.get(word) == count:
+                return count, word
+
+    def _rebuild_heap(self):
+        self._heap = [(count, word) for word, count in self._counts.items()]
+        heapq.heapify(self._heap)
+
+    def _min_count(self):
+        # Count assumed for words this summary does not monitor
+        if len(self._counts) < self.capacity:
+            return 0
+        return min(self._counts.values())
+
+    def merge(self, other):
+        """Adds another summary into this one (mergeable Space-Saving)."""
+        own_min = self._min_count()
+        other_min = other._min_count()
+        counts = {}
+        errors = {}
+        for word in self._counts.keys() | other._counts.keys():
+            counts[word] = self._counts.get(word, own_min) + other._counts.get(word, other_min)
+            errors[word] = self._errors.get(word, own_min) + other._errors.get(word, other_min)
+        if len(counts) > self.capacity:
+            kept = heapq.nlargest(self.capacity, counts, key=counts.get)
+            counts = {word: counts[word] for word in kept}
+            errors = {word: errors[word] for word in kept}
+        self._counts = counts
+        self._errors = errors
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+
+    def items(self):
+        """Returns (word, count, error) tuples, highest count first."""
+        return sorted(
+            ((word, count, self._errors[word]) for word, count in self._counts.items()),
+            key=lambda item: item[1], reverse=True
+        )
+
+    def to_df(self):
+        items = self.items()
+        return pd.DataFrame({
+            'Word': [word for word, _, _ in items],
+            'Count': [count for _, count, _ in items],
+            'Error': [error for _, _, error in items],
+        })
@@ -1,5 +1,8 @@
+import multiprocessing
 from gui_app import VisualizationApp
 
 if __name__ == "__main__":
+    # Needed by the tokenizer process pool in the frozen EXE
+    multiprocessing.freeze_support()
     app = VisualizationApp()
     app.mainloop()
\ No newline at end of file
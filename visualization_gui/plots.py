@@ -6,6 +6,9 @@ from matplotlib.colors import Normalize
 import seaborn as sns
 from wordcloud import WordCloud
 import pandas as pd
+from workbook_cache import read_workbook
+from report_loader import load_report
+from resolution_column import RESOLUTION_METRICS
 
 
 def load_japanese_font():
@@ -134,8 +137,9 @@ def generate_bubble_chart(df_words, n, color_dict, output_path, sheet_name, top_
     plt.close()
 
 def generate_category_pie_chart(excel_file):
-    df = pd.read_excel(excel_file, sheet_name=None, header=None)
-    category_counts = {sheet_name: len(sheet_data) for sheet_name, sheet_data in df.items() if not sheet_data.empty}
+    df = read_workbook(excel_file)
+    # Counted as rows of a header-less read, so the header row is included as before
+    category_counts = {sheet_name: len(sheet_data) + 1 for sheet_name, sheet_data in df.items() if len(sheet_data.columns)}
     labels = list(category_counts.keys())[::-1]
     sizes = list(category_counts.values())[::-1]
     fig, ax = plt.subplots(figsize=(6, 6))
@@ -156,9 +160,10 @@ def generate_category_pie_chart(excel_file):
     plt.close(fig)
     return output_path
 
-def generate_category_box_plot(excel_file, selected_priority="All"):
-    # Read data from Excel file
-    excel_data = pd.read_excel(excel_file, sheet_name=None)
+def generate_category_box_plot(excel_file, selected_priority="All", metric="days spent to resolve"):
+    # Read the already computed metric column (see resolution_column.RESOLUTION_METRICS)
+    excel_data = load_report(excel_file, [metric, 'priority'])
+    metric_label = RESOLUTION_METRICS.get(metric, metric.title())
     data = []
     sheet_order = list(excel_data.keys())
 
@@ -185,14 +190,13 @@ def generate_category_box_plot(excel_file, selected_priority="All"):
 
     for sheet_name in sheet_order:
         df = excel_data[sheet_name]
-        df.columns = [col.strip().lower() for col in df.columns]
-        if 'days spent to resolve' in df.columns:
+        if metric in df.columns:
             if priorities_filter is not None and 'priority' in df.columns:
                 df = df[df['priority'].astype(str).isin(priorities_filter)]
-            for days in df['days spent to resolve']:
-                data.append({'Category': sheet_name, 'DaysToResolve': days})
+            for value in df[metric]:
+                data.append({'Category': sheet_name, 'Value': value})
         else:
-            return False, None, 'No "days spent to resolve" column found.'
+            return False, None, f'No "{metric}" column found.'
 
     if not data:
         if priorities_filter is not None:
@@ -205,19 +209,21 @@ def generate_category_box_plot(excel_file, selected_priority="All"):
 
     # Generate box plot
     plt.figure(figsize=(8, 6))
-    title = 'Days Spent to Resolve Defects by Category'
+    title = f'{metric_label} Defects by Category'
     if show_priorities_in_title and priorities_filter:
         title += f" (Priority: {', '.join(priorities_filter)})"
-    sns.boxplot(x='Category', y='DaysToResolve', data=df, hue='Category', palette='Set2', order=sheet_order, legend=False)
+    sns.boxplot(x='Category', y='Value', data=df, hue='Category', palette='Set2', order=sheet_order, legend=False)
     plt.title(title)
     plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.ylabel('Days Spent to Resolve')
+    plt.ylabel(metric_label)
     plt.xlabel('Defect Category')
     plt.tight_layout()
+    # Calendar days keep the original file names; other metrics add e.g. "_business_days"
+    metric_suffix = "" if metric == "days spent to resolve" else "_" + metric.replace(" to resolve", "").replace(" ", "_")
     if show_priorities_in_filename and priorities_filter:
-        output_path = f"{os.path.splitext(excel_file)[0]}_boxplot_{'_'.join(priorities_filter).lower()}.png"
+        output_path = f"{os.path.splitext(excel_file)[0]}_boxplot{metric_suffix}_{'_'.join(priorities_filter).lower()}.png"
     else:
-        output_path = f"{os.path.splitext(excel_file)[0]}_boxplot.png"
+        output_path = f"{os.path.splitext(excel_file)[0]}_boxplot{metric_suffix}.png"
     plt.savefig(output_path)
     plt.close()
     return True, output_path, None
@@ -229,13 +235,11 @@ def generate_priority_category_bar_plot(excel_file):
     Each sheet is treated as a category. The function expects a categorized defect report Excel file.
     """
     # Read all sheets and concatenate into a single DataFrame with a 'Category' column
-    excel_data = pd.read_excel(excel_file, sheet_name=None)
+    excel_data = load_report(excel_file, ['priority'])
     records = []
     for sheet_name, df in excel_data.items():
-        if df.empty:
+        if len(df) == 0:
             continue
-        df = df.copy()
-        df.columns = [col.lower() for col in df.columns]
         if 'priority' in df.columns:
             for _, row in df.iterrows():
                 records.append({'Category': sheet_name, 'Priority': row['priority']})
@@ -266,13 +270,11 @@ def generate_defect_type_category_bar_plot(excel_file):
     Each sheet is treated as a category. The function expects a categorized defect report Excel file.
     """
     # Read all sheets and concatenate into a single DataFrame with a 'Category' column
-    excel_data = pd.read_excel(excel_file, sheet_name=None)
+    excel_data = load_report(excel_file, ['custom field (category)'])
     records = []
     for sheet_name, df in excel_data.items():
-        if df.empty:
+        if len(df) == 0:
             continue
-        df = df.copy()
-        df.columns = [col.lower() for col in df.columns]
         if 'custom field (category)' in df.columns:
             for _, row in df.iterrows():
                 records.append({'Category': sheet_name, 'DefectType': row['custom field (category)']})
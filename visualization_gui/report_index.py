@@ -0,0 +1,234 @@
+"""
+Persisted inverted index over the summaries of a defect report.
+
+The report is read and tokenized once. Each row keeps integer codes for its
+sheet, priority and category plus its created and resolved dates, and each
+token keeps the sorted IDs of the rows it appears in. Word counts for any
+filter combination are then boolean row masks over these arrays, without
+reading or tokenizing the report again.
+
+The index is saved next to the report as <report>_index.npz and rebuilt
+when the report or the tokenizer changes.
+"""
+import os
+import numpy as np
+import pandas as pd
+from config import all_categories_sheet
+from text_preprocessing import get_tokenizer, save_lemma_cache
+from token_corpus import TokenCorpus, Vocabulary, counts_to_word_count_df
+from report_loader import load_report
+from filter_engine import CATEGORY_COLUMNS, DATE_COLUMNS, compile_spec, category_mask, date_mask
+
+INDEX_VERSION = 1
+
+
+def get_index_path(input_excel):
+    return os.path.splitext(input_excel)[0] + "_index.npz"
+
+
+def _source_stamp(input_excel):
+    stat = os.stat(input_excel)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+class ReportIndex:
+    def __init__(self, corpus, sheet_names, sheet_codes, categories, dates):
+        self.corpus = corpus
+        self.sheet_names = sheet_names
+        self.sheet_codes = sheet_codes
+        # column -> (labels, per-row codes with -1 for blanks, per-sheet column presence)
+        self.categories = categories
+        # column -> (per-row datetime64 values, per-sheet column presence)
+        self.dates = dates
+        self._build_postings()
+
+    def __len__(self):
+        return len(self.corpus)
+
+    @classmethod
+    def build(cls, input_excel, tokenizer=None):
+        """Reads and tokenizes every sheet with a summary column."""
+        excel_data = load_report(input_excel, ['summary'] + [col.lower() for col in CATEGORY_COLUMNS] + DATE_COLUMNS)
+        frames = []
+        for sheet_name, df in excel_data.items():
+            if 'summary' in df.columns:
+                frames.append((sheet_name, df))
+        if not frames:
+            raise ValueError("Summary' column not found.")
+
+        sheet_names = [sheet_name for sheet_name, _ in frames]
+        sheet_codes = np.repeat(np.arange(len(frames), dtype=np.int32), [len(df) for _, df in frames])
+        summaries = pd.concat([df['summary'] for _, df in frames], ignore_index=True).fillna("")
+        corpus = TokenCorpus.from_texts(summaries, tokenizer=tokenizer)
+        save_lemma_cache()
+
+        categories = {}
+        for col in CATEGORY_COLUMNS:
+            col_key = col.lower()
+            present = np.array([col_key in df.columns for _, df in frames])
+            values = pd.concat(
+                [df[col_key].astype(object) if col_key in df.columns else pd.Series([None] * len(df), dtype=object)
+                 for _, df in frames],
+                ignore_index=True
+            )
+            # Labels are kept as text so they survive saving and match the dialog values
+            values = values.where(values.isna(), values.astype(str))
+            codes, labels = pd.factorize(values, sort=True)
+            categories[col] = (list(labels), codes.astype(np.int32), present)
+
+        dates = {}
+        for col in DATE_COLUMNS:
+            present = np.array([col in df.columns for _, df in frames])
+            values = pd.concat(
+                [df[col] if col in df.columns
+                 else pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]') for _, df in frames],
+                ignore_index=True
+            )
+            dates[col] = (values.to_numpy(dtype='datetime64[ns]'), present)
+        return cls(corpus, sheet_names, sheet_codes, categories, dates)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            corpus = TokenCorpus(Vocabulary(data['vocabulary'].tolist()), data['offsets'], data['ids'])
+            categories = {
+                col: (data[f'labels_{i}'].tolist(), data[f'codes_{i}'], data[f'present_{i}'])
+                for i, col in enumerate(CATEGORY_COLUMNS)
+            }
+            dates = {
+                col: (data[f'dates_{i}'], data[f'date_present_{i}'])
+                for i, col in enumerate(DATE_COLUMNS)
+            }
+            return cls(corpus, data['sheet_names'].tolist(), data['sheet_codes'], categories, dates)
+
+    def save(self, path, source_stamp, fingerprint):
+        arrays = {
+            'version': np.array(INDEX_VERSION),
+            'source': source_stamp,
+            'fingerprint': np.array(fingerprint),
+            'vocabulary': np.array(self.corpus.vocabulary.words, dtype=str),
+            'offsets': self.corpus.offsets,
+            'ids': self.corpus.ids,
+            'sheet_names': np.array(self.sheet_names, dtype=str),
+            'sheet_codes': self.sheet_codes,
+        }
+        for i, col in enumerate(CATEGORY_COLUMNS):
+            labels, codes, present = self.categories[col]
+            arrays[f'labels_{i}'] = np.array(labels, dtype=str)
+            arrays[f'codes_{i}'] = codes
+            arrays[f'present_{i}'] = present
+        for i, col in enumerate(DATE_COLUMNS):
+            values, present = self.dates[col]
+            arrays[f'dates_{i}'] = values
+            arrays[f'date_present_{i}'] = present
+        # np.savez appends .npz unless given a file object
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def is_current(path, input_excel, fingerprint):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return (int(data['version']) == INDEX_VERSION
+                        and np.array_equal(data['source'], _source_stamp(input_excel))
+                        and str(data['fingerprint']) == fingerprint)
+        except Exception:
+            return False
+
+    def _build_postings(self):
+        # Token ID -> sorted unique row IDs, stored CSR style like the corpus
+        corpus = self.corpus
+        n_rows = max(len(corpus), 1)
+        rows = np.repeat(np.arange(len(corpus), dtype=np.int64), corpus.lengths)
+        pairs = np.unique(corpus.ids.astype(np.int64) * n_rows + rows)
+        token_ids = pairs // n_rows
+        self._posting_rows = (pairs % n_rows).astype(np.int32)
+        self._posting_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(token_ids, minlength=len(corpus.vocabulary)))]
+        )
+
+    def rows_with(self, word):
+        """Sorted IDs of the rows whose summary contains word."""
+        token_id = self.corpus.vocabulary.get(word)
+        if token_id is None:
+            return np.zeros(0, dtype=np.int32)
+        return self._posting_rows[self._posting_offsets[token_id]:self._posting_offsets[token_id + 1]]
+
+    def unique_values(self):
+        """Filter values per category column, for MultiFilterDialog."""
+        return {col: labels for col, (labels, codes, present) in self.categories.items() if present.any()}
+
+    def date_columns(self):
+        return [col for col, (values, present) in self.dates.items() if present.any()]
+
+    def mask(self, selected=None, words=None):
+        """
+        Boolean row mask for a MultiFilterDialog selection: {column: [values],
+        'date_ranges': {column: (from, to)}}. Like the filter dialog, a filter
+        is ignored on sheets without its column. With words, rows must also
+        contain every one of them.
+        """
+        value_sets, bounds = compile_spec(selected or {})
+        mask = np.ones(len(self), dtype=bool)
+        for col, wanted in value_sets.items():
+            labels, codes, present = self.categories[col]
+            mask &= category_mask(labels, codes, wanted) | ~present[self.sheet_codes]
+        for col, (lower, upper) in bounds.items():
+            if col in self.dates:
+                values, present = self.dates[col]
+                mask &= date_mask(values, lower, upper) | ~present[self.sheet_codes]
+        for word in words or []:
+            word_mask = np.zeros(len(self), dtype=bool)
+            word_mask[self.rows_with(word)] = True
+            mask &= word_mask
+        return mask
+
+    def word_count_tables(self, selected=None, words=None):
+        """
+        Word/Count tables of the matching rows, one per sheet with any match,
+        plus the combined table when several sheets match.
+        """
+        mask = self.mask(selected, words)
+        n_sheets = len(self.sheet_names)
+        counts = self.corpus.select(mask).counts_by(self.sheet_codes[mask], n_sheets)
+        rows_per_sheet = np.bincount(self.sheet_codes[mask], minlength=n_sheets)
+        tables = {}
+        for code, sheet_name in enumerate(self.sheet_names):
+            if rows_per_sheet[code] and counts[code].any():
+                tables[sheet_name[:31]] = counts_to_word_count_df(counts[code], self.corpus.vocabulary)
+        if len(tables) > 1 and all_categories_sheet not in tables:
+            tables[all_categories_sheet] = counts_to_word_count_df(counts.sum(axis=0), self.corpus.vocabulary)
+        return tables
+
+
+def get_report_index(input_excel, tokenizer=None):
+    """Loads the saved index of input_excel, rebuilding it if it is missing or stale."""
+    tokenizer = tokenizer or get_tokenizer()
+    fingerprint = tokenizer.fingerprint()
+    path = get_index_path(input_excel)
+    if os.path.exists(path) and ReportIndex.is_current(path, input_excel, fingerprint):
+        return ReportIndex.load(path)
+    stamp = _source_stamp(input_excel)
+    index = ReportIndex.build(input_excel, tokenizer)
+    try:
+        index.save(path, stamp, fingerprint)
+    except OSError as e:
+        print(f"Could not save report index: {e}")
+    return index
+
+
+def filtered_word_count(input_excel, selected, words=None):
+    """
+    Writes the word counts of the rows matching a filter selection to
+    <report>_index_wordcount.xlsx, using the report index. The name differs from
+    the Filter -> Word Count output, whose table update_word_count may top up.
+    """
+    index = get_report_index(input_excel)
+    tables = index.word_count_tables(selected, words)
+    if not tables:
+        return None, False, "No defect reports found with the selected filters."
+    output_excel = os.path.splitext(input_excel)[0] + "_index_wordcount.xlsx"
+    with pd.ExcelWriter(output_excel, engine='xlsxwriter') as writer:
+        for sheet_name, df in tables.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return output_excel, True, None
@@ -0,0 +1,83 @@
+"""
+Typed loading of Jira defect report exports.
+
+The columns the tool uses are declared once in JIRA_COLUMNS. load_report
+reads only the requested ones (through the workbook and sidecar caches),
+with headers already normalized to lowercase, and converts each column to
+its declared type a single time: dates to datetime64, priority and
+category to the pandas category dtype, and day counts to numbers.
+"""
+import warnings
+import numpy as np
+import pandas as pd
+from config import issue_key_column
+from workbook_cache import read_sheet, read_workbook
+
+JIRA_COLUMNS = {
+    "summary": "text",
+    issue_key_column: "text",
+    "category": "category",
+    "priority": "category",
+    "custom field (category)": "category",
+    "created": "date",
+    "resolved": "date",
+    "days spent to resolve": "number",
+    "business days to resolve": "number",
+    "business hours to resolve": "number",
+}
+
+# Jira's default export format (e.g. "03/Feb/24 10:23 AM"), which pandas cannot infer
+JIRA_DATE_FORMATS = ["%d/%b/%y %I:%M %p"]
+
+
+def parse_dates(values):
+    """
+    Parses a column of dates as the filter dialog does (day first, invalid
+    dates become NaT). Each distinct value is parsed once, a whole format
+    at a time; values in no common format are parsed one by one.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    with warnings.catch_warnings():
+        # "Could not infer format" only means the values are parsed one by one
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+        # Jira's own format first, then the format inferred from the rest, then each value alone
+        for date_format in JIRA_DATE_FORMATS + [None, 'mixed']:
+            failed = np.flatnonzero(parsed.isna().to_numpy())
+            if not len(failed):
+                break
+            if date_format in JIRA_DATE_FORMATS and pd.isna(
+                    pd.to_datetime(uniques[failed[:1]], errors='coerce', format=date_format)[0]):
+                # Skip a fixed format the first remaining value is not in
+                continue
+            parsed.iloc[failed] = pd.to_datetime(uniques[failed], errors='coerce', dayfirst=True, format=date_format)
+    # Missing cells have code -1, which picks the NaT appended at the end
+    parsed = np.append(parsed.to_numpy(), np.datetime64('NaT'))
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
+
+
+def apply_schema(df):
+    """Converts the known Jira columns of a normalized frame to their declared types."""
+    for col in df.columns:
+        kind = JIRA_COLUMNS.get(col)
+        if kind == "date":
+            df[col] = parse_dates(df[col])
+        elif kind == "category":
+            df[col] = df[col].astype("category")
+        elif kind == "number":
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def load_report(path, columns=None, sheet_name=None):
+    """
+    Returns {sheet name: DataFrame} for every sheet, or one DataFrame when
+    sheet_name (a name or position) is given. With columns, only those the
+    sheet has are read; the others are simply absent from the frame.
+    """
+    if sheet_name is not None:
+        return apply_schema(read_sheet(path, sheet_name, columns))
+    return {name: apply_schema(df) for name, df in read_workbook(path, columns).items()}
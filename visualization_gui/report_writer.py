@@ -0,0 +1,145 @@
+"""
+Streaming output of defect report tables.
+
+ReportWriter writes sheets row chunk by row chunk instead of building a
+formatted copy of every sheet in memory first. The default xlsx output uses
+xlsxwriter's constant_memory mode, which flushes each row to disk as soon as
+the next one starts, so writing a 500k-row workbook needs little more memory
+than the DataFrame being written. With output_format = "csv" or "parquet"
+(config.py) each sheet becomes its own file in an output folder instead,
+which is faster still for users who do not need Excel.
+"""
+import datetime
+import os
+import re
+import numpy as np
+import pandas as pd
+from config import output_format, output_chunk_rows
+
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+EXCEL_MAX_ROWS = 1048576
+DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+
+
+def _get_format(fmt=None):
+    fmt = fmt or output_format
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}'. Available: {', '.join(OUTPUT_FORMATS)}")
+    return fmt
+
+
+def get_output_path(input_excel, suffix, fmt=None):
+    """
+    Output path for input_excel, e.g. suffix "_filtered": report_filtered.xlsx,
+    or the folder report_filtered/ holding one file per sheet for csv/parquet.
+    """
+    # Always derived from the name without its extension, so an .xls report is never overwritten
+    base = os.path.splitext(input_excel)[0] + suffix
+    return base + ".xlsx" if _get_format(fmt) == "xlsx" else base
+
+
+def _sheet_file_name(sheet_name):
+    # Sheet names may contain characters that are not allowed in file names
+    return re.sub(r'[\\/:*?"<>|]', "_", str(sheet_name)).strip() or "Sheet"
+
+
+class ReportWriter:
+    """
+    Writes sheets one after another; use as a context manager:
+
+        with ReportWriter(output_path) as writer:
+            writer.write_sheet("High", df, rows=positions)
+    """
+
+    def __init__(self, output_path, fmt=None, chunk_rows=output_chunk_rows):
+        self.output_path = output_path
+        self.format = _get_format(fmt)
+        self.chunk_rows = chunk_rows
+        self._workbook = None
+        if self.format == "xlsx":
+            import xlsxwriter
+            self._workbook = xlsxwriter.Workbook(output_path, {"constant_memory": True})
+            # Same header and date styles as DataFrame.to_excel
+            self._header_format = self._workbook.add_format(
+                {"bold": True, "border": 1, "align": "center", "valign": "top"})
+            self._datetime_format = self._workbook.add_format({"num_format": DATETIME_FORMAT})
+        else:
+            os.makedirs(output_path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def write_sheet(self, sheet_name, df, rows=None):
+        """
+        Writes df (or only its rows at the given positions) as one sheet, a
+        chunk of rows at a time, so no full copy of the output is ever made.
+        """
+        positions = np.arange(len(df)) if rows is None else np.asarray(rows)
+        chunks = (df.iloc[positions[start:start + self.chunk_rows]]
+                  for start in range(0, len(positions), self.chunk_rows))
+        if self.format == "xlsx":
+            if len(positions) >= EXCEL_MAX_ROWS:
+                raise ValueError(f"Sheet '{sheet_name}' has {len(positions)} rows, more than Excel allows. "
+                                 "Set output_format to 'csv' or 'parquet' in config.py.")
+            self._write_xlsx(str(sheet_name)[:31], df.columns, chunks)
+        elif self.format == "csv":
+            self._write_csv(sheet_name, df.head(0), chunks)
+        else:
+            self._write_parquet(sheet_name, df, chunks)
+
+    def _write_xlsx(self, sheet_name, columns, chunks):
+        worksheet = self._workbook.add_worksheet(sheet_name)
+        for col, name in enumerate(columns):
+            worksheet.write_string(0, col, str(name), self._header_format)
+        row = 1
+        for chunk in chunks:
+            for values in chunk.itertuples(index=False, name=None):
+                for col, value in enumerate(values):
+                    self._write_cell(worksheet, row, col, value)
+                row += 1
+
+    def _write_cell(self, worksheet, row, col, value):
+        # Missing values (None, NaN, NaT) are left as empty cells
+        if value is None or value is pd.NaT or value is pd.NA or (
+                isinstance(value, (float, np.floating)) and value != value):
+            return
+        if isinstance(value, str):
+            worksheet.write_string(row, col, value)
+        elif isinstance(value, (bool, np.bool_)):
+            worksheet.write_boolean(row, col, bool(value))
+        elif isinstance(value, (int, float, np.integer, np.floating)):
+            worksheet.write_number(row, col, value)
+        elif isinstance(value, pd.Timestamp):
+            worksheet.write_datetime(row, col, value.to_pydatetime(), self._datetime_format)
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            worksheet.write_datetime(row, col, value, self._datetime_format)
+        else:
+            worksheet.write(row, col, str(value))
+
+    def _write_csv(self, sheet_name, header, chunks):
+        path = os.path.join(self.output_path, _sheet_file_name(sheet_name) + ".csv")
+        # BOM so Excel opens the Japanese text as UTF-8
+        header.to_csv(path, index=False, encoding="utf-8-sig")
+        for chunk in chunks:
+            chunk.to_csv(path, mode="a", header=False, index=False, date_format="%Y-%m-%d %H:%M:%S")
+
+    def _write_parquet(self, sheet_name, df, chunks):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = os.path.join(self.output_path, _sheet_file_name(sheet_name) + ".parquet")
+        # Text columns may mix numbers and strings (e.g. IDs); store them all as text
+        text_columns = [col for col in df.columns if df[col].dtype == object]
+        schema = pa.Schema.from_pandas(df.head(0).astype({col: "string" for col in text_columns}),
+                                       preserve_index=False)
+        with pq.ParquetWriter(path, schema) as parquet_writer:
+            for chunk in chunks:
+                chunk = chunk.astype({col: "string" for col in text_columns})
+                parquet_writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
@@ -1,40 +1,176 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
+from config import resolution_sheet_workers, business_holidays_path, business_weekmask, business_hours
+from get_utils import get_sheet_names
+from report_loader import parse_dates
+from workbook_cache import read_sheet
+from report_writer import ReportWriter, get_output_path
 
-def convert_to_date(value):
+# Resolution metric columns and their plot labels
+RESOLUTION_METRICS = {
+    "days spent to resolve": "Days Spent to Resolve",
+    "business days to resolve": "Business Days to Resolve",
+    "business hours to resolve": "Business Hours to Resolve",
+}
+PERCENTILES = {"Median": 0.5, "P90": 0.9, "P99": 0.99}
+
+
+def load_holidays(path):
+    """
+    Reads a holiday calendar: one date per line, optionally followed by a
+    comma and a name, as in the Cabinet Office's syukujitsu.csv (Shift-JIS).
+    Lines that are not dates, such as a header, are skipped.
+    """
     try:
-        return pd.to_datetime(value, errors="coerce", dayfirst=True)
-    except:
-        return value
+        with open(path, encoding="utf-8-sig") as f:
+            text = f.read()
+    except UnicodeDecodeError:
+        with open(path, encoding="cp932") as f:
+            text = f.read()
+    fields = [line.split("#")[0].split(",")[0].strip() for line in text.splitlines()]
+    dates = pd.to_datetime(pd.Series([field for field in fields if field], dtype=object), errors="coerce",
+                           format="mixed")
+    return np.unique(dates.dropna().to_numpy().astype("datetime64[D]"))
+
+
+@lru_cache(maxsize=1)
+def get_business_calendar():
+    """Working days from business_weekmask and business_holidays_path in config.py."""
+    holidays = load_holidays(business_holidays_path) if business_holidays_path else []
+    return np.busdaycalendar(weekmask=business_weekmask, holidays=holidays)
+
+
+def count_business_days(created, resolved, calendar):
+    """
+    Working days from each created date up to (not including) its resolved
+    date. NaN where either date is missing or resolved is before created, as
+    in count_business_hours, so the percentile summaries skip those rows.
+    """
+    valid = (created.notna() & resolved.notna() & (resolved >= created)).to_numpy()
+    days = np.full(len(created), np.nan)
+    days[valid] = np.busday_count(created.to_numpy()[valid].astype("datetime64[D]"),
+                                  resolved.to_numpy()[valid].astype("datetime64[D]"), busdaycal=calendar)
+    return days
 
 
-def add_resolution_period_column_logic(input_excel):
-    # Load the Excel file
-    original_wb = load_workbook(input_excel)
-    original_sheet_name = original_wb.sheetnames[0]
+def count_business_hours(created, resolved, calendar, hours):
+    """
+    Working hours between created and resolved, counting only the hours of
+    hours = (start, end) on working days. NaN where either date is missing
+    or resolved is before created.
+    """
+    open_hour, close_hour = hours
+    valid = (created.notna() & resolved.notna() & (resolved >= created)).to_numpy()
+    result = np.full(len(created), np.nan)
+    begin = created.to_numpy()[valid]
+    end = resolved.to_numpy()[valid]
+    begin_day = begin.astype("datetime64[D]")
+    end_day = end.astype("datetime64[D]")
+    # Time of day in hours, clipped to the working day
+    begin_hour = np.clip((begin - begin_day) / np.timedelta64(1, "h"), open_hour, close_hour)
+    end_hour = np.clip((end - end_day) / np.timedelta64(1, "h"), open_hour, close_hour)
+    begin_open = np.is_busday(begin_day, busdaycal=calendar)
+    end_open = np.is_busday(end_day, busdaycal=calendar)
+    same_day = begin_day == end_day
+    # Whole working days strictly between the first and the last day
+    full_days = np.busday_count(np.where(same_day, end_day, begin_day + 1), end_day, busdaycal=calendar)
+    result[valid] = np.where(
+        same_day,
+        np.where(begin_open, end_hour - begin_hour, 0),
+        full_days * (close_hour - open_hour)
+        + np.where(begin_open, close_hour - begin_hour, 0)
+        + np.where(end_open, end_hour - open_hour, 0),
+    ).round(2)
+    return result
 
-    # Read the sheet into a DataFrame
-    df = pd.read_excel(input_excel, engine="openpyxl", sheet_name=original_sheet_name)
 
-    # Convert column names to lowercase
-    df.columns = [col.lower() for col in df.columns]
+def add_resolution_period(df, calendar=None):
+    """
+    Returns the sheet with 'created' and 'resolved' parsed to dates and the
+    resolution metrics added (calendar days, business days and, when
+    business_hours is set, business hours), or None if it lacks either
+    date column.
+    """
+    if "created" not in df.columns or "resolved" not in df.columns:
+        return None
+    if calendar is None:
+        calendar = get_business_calendar()
+    # Each distinct date string is parsed once, the whole column at a time
+    df["created"] = parse_dates(df["created"])
+    df["resolved"] = parse_dates(df["resolved"])
+    df["days spent to resolve"] = (df["resolved"] - df["created"]).dt.days
+    df["business days to resolve"] = count_business_days(df["created"], df["resolved"], calendar)
+    if business_hours:
+        df["business hours to resolve"] = count_business_hours(df["created"], df["resolved"], calendar,
+                                                               business_hours)
+    return df
 
-    # Convert 'created' and 'resolved' columns to proper date formats
-    if "created" in df.columns:
-        df["created"] = df["created"].apply(convert_to_date)
-    if "resolved" in df.columns:
-        df["resolved"] = df["resolved"].apply(convert_to_date)
 
-    # Add the 'days spent to resolve' column
-    if "created" in df.columns and "resolved" in df.columns:
-        df["days spent to resolve"] = (df["resolved"] - df["created"]).dt.days
+def resolution_summary(sheets):
+    """
+    Median, P90 and P99 of each resolution metric per category (sheet) and
+    per priority, as {table name: DataFrame}.
+    """
+    metrics = [metric for metric in RESOLUTION_METRICS if any(metric in df.columns for df in sheets.values())]
+    data = pd.concat(
+        [df[[col for col in metrics + ["priority"] if col in df.columns]].assign(category=name)
+         for name, df in sheets.items()],
+        ignore_index=True
+    )
+    tables = {}
+    for group, table_name in [("category", "By Category"), ("priority", "By Priority")]:
+        if group not in data.columns:
+            continue
+        rows = []
+        for metric in metrics:
+            grouped = data.groupby(data[group].astype(object), sort=False)[metric]
+            quantiles = grouped.quantile(list(PERCENTILES.values())).unstack()
+            quantiles.columns = list(PERCENTILES)
+            table = quantiles.assign(Count=grouped.count()).reset_index(names=group.capitalize())
+            table.insert(1, "Metric", RESOLUTION_METRICS[metric])
+            rows.append(table[[group.capitalize(), "Metric", "Count"] + list(PERCENTILES)])
+        tables[table_name] = pd.concat(rows, ignore_index=True)
+    return tables
+
+
+def _resolution_sheet(input_excel, sheet_name):
+    # Read the sheet into a DataFrame, with column names in lowercase
+    df = read_sheet(input_excel, sheet_name)
+    resolved = add_resolution_period(df)
+    return (df, False) if resolved is None else (resolved, True)
+
+
+def add_resolution_period_column_logic(input_excel, workers=None):
+    """
+    Adds the resolution metrics to every sheet that has 'Created' and
+    'Resolved' columns, one sheet per worker process when there are several.
+    Other sheets are copied unchanged. Also writes the percentile summary of
+    the metrics; returns (output path, summary path).
+    """
+    sheet_names = get_sheet_names(input_excel)
+    workers = workers or resolution_sheet_workers or os.cpu_count() or 1
+    if workers <= 1 or len(sheet_names) <= 1:
+        results = [_resolution_sheet(input_excel, sheet_name) for sheet_name in sheet_names]
     else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sheet_names))) as pool:
+            results = list(pool.map(_resolution_sheet, [input_excel] * len(sheet_names), sheet_names))
+    if not any(added for _, added in results):
         raise ValueError("Required columns 'Created' and 'Resolved' are missing.")
 
-    # Save the updated DataFrame to a new Excel file
-    output_excel = input_excel.replace(".xlsx", "_with_resolution_period.xlsx")
-    with pd.ExcelWriter(output_excel, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name=original_sheet_name)
+    # Save the updated sheets to a new Excel file
+    output_excel = get_output_path(input_excel, "_with_resolution_period")
+    with ReportWriter(output_excel) as writer:
+        for sheet_name, (df, _) in zip(sheet_names, results):
+            writer.write_sheet(sheet_name, df)
+
+    # Percentiles of the sheets just computed, without reading them back
+    summary_excel = get_output_path(input_excel, "_resolution_summary")
+    tables = resolution_summary({name: df for name, (df, added) in zip(sheet_names, results) if added})
+    with ReportWriter(summary_excel) as writer:
+        for table_name, table in tables.items():
+            writer.write_sheet(table_name, table)
 
-    return output_excel
-    
\ No newline at end of file
+    return output_excel, summary_excel
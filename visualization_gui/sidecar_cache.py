@@ -0,0 +1,258 @@
+"""
+Columnar (Parquet) copies of parsed Excel sheets, kept in a cache folder.
+
+The first time a sheet is parsed from an .xlsx file it is also written as
+Parquet, with headers already normalized. Later reads, including from new
+processes, load the Parquet file instead, reading only the requested
+columns. A sidecar written by a projected read holds only the columns read
+so far; the manifest also keeps the sheet's full header, so a read needing
+other columns goes back to Excel. Each source file has its own folder with
+a manifest recording the file's modification time and size; when either
+changes the folder is discarded. Folders of reports not opened for sidecar_cache_max_age_days,
+and the least recently opened ones beyond sidecar_cache_max_bytes, are
+removed whenever a sidecar is written. Any failure to read or write a
+sidecar falls back to the Excel file.
+
+Columns that mix types (e.g. numbers and text), which Parquet cannot store
+as is, are stored as text next to a column naming each value's type, and
+converted back when read. A sheet whose values would not come back exactly
+is not cached.
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from config import sidecar_cache_dir, sidecar_cache_max_bytes, sidecar_cache_max_age_days
+
+MANIFEST_NAME = "manifest.json"
+# Prefix of the value type columns of mixed columns; Excel headers cannot contain NUL
+TYPE_COLUMN_PREFIX = "\x00type:"
+# Value types of mixed columns, by name, and how to parse them back from text
+_VALUE_TYPES = {
+    int: "int", float: "float", bool: "bool",
+    datetime.datetime: "datetime", datetime.date: "date", datetime.time: "time", pd.Timestamp: "timestamp",
+    np.int64: "int64", np.float64: "float64", np.bool_: "bool_",
+}
+_VALUE_PARSERS = {
+    "int": int, "float": float, "bool": lambda text: text == "True",
+    "datetime": datetime.datetime.fromisoformat, "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat, "timestamp": pd.Timestamp,
+    "int64": np.int64, "float64": np.float64, "bool_": lambda text: np.bool_(text == "True"),
+}
+
+
+class SidecarCache:
+    def __init__(self, directory=sidecar_cache_dir, max_bytes=sidecar_cache_max_bytes,
+                 max_age_days=sidecar_cache_max_age_days):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, path):
+        return os.path.join(self.directory, hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def _sheet_file(sheet_name):
+        return hashlib.sha1(str(sheet_name).encode("utf-8")).hexdigest()[:16] + ".parquet"
+
+    def _load_manifest(self, path, stamp):
+        manifest_path = os.path.join(self._entry_dir(path), MANIFEST_NAME)
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if [manifest.get("mtime_ns"), manifest.get("size")] != list(stamp):
+            return None
+        return manifest
+
+    def _save_manifest(self, path, manifest):
+        entry_dir = self._entry_dir(path)
+        fd, temp_path = tempfile.mkstemp(suffix=".json", dir=entry_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, os.path.join(entry_dir, MANIFEST_NAME))
+
+    def _manifest_for_update(self, path, stamp):
+        # Returns the current manifest, starting a fresh folder if the source changed
+        manifest = self._load_manifest(path, stamp)
+        if manifest is None:
+            entry_dir = self._entry_dir(path)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.makedirs(entry_dir, exist_ok=True)
+            manifest = {"source": os.path.abspath(path), "mtime_ns": stamp[0], "size": stamp[1],
+                        "sheet_names": None, "sheets": {}}
+        return manifest
+
+    def sheet_names(self, path, stamp):
+        manifest = self._load_manifest(path, stamp)
+        return manifest["sheet_names"] if manifest else None
+
+    def store_sheet_names(self, path, stamp, sheet_names):
+        try:
+            with self._lock:
+                manifest = self._manifest_for_update(path, stamp)
+                manifest["sheet_names"] = list(sheet_names)
+                self._save_manifest(path, manifest)
+        except OSError as e:
+            print(f"Could not write sidecar manifest for {path}: {e}")
+
+    def stored_columns(self, path, stamp, sheet_name):
+        """Columns the sidecar of a sheet holds, or None if there is none."""
+        manifest = self._load_manifest(path, stamp)
+        if not manifest or sheet_name not in manifest["sheets"]:
+            return None
+        return manifest["columns"][sheet_name]
+
+    def load(self, path, stamp, sheet_name, columns=None):
+        """
+        Returns the sheet (or the requested columns that exist), or None if
+        there is no valid sidecar holding them.
+        """
+        manifest = self._load_manifest(path, stamp)
+        if not manifest or sheet_name not in manifest["sheets"]:
+            return None
+        available = manifest["columns"][sheet_name]
+        header = manifest.get("headers", {}).get(sheet_name, available)
+        wanted = header if columns is None else [col for col in columns if col in header]
+        if any(col not in available for col in wanted):
+            return None
+        mixed = [col for col in manifest.get("mixed", {}).get(sheet_name, []) if col in wanted]
+        sheet_path = os.path.join(self._entry_dir(path), manifest["sheets"][sheet_name])
+        try:
+            read_columns = None if columns is None else wanted + [TYPE_COLUMN_PREFIX + col for col in mixed]
+            df = _decode_mixed_columns(pd.read_parquet(sheet_path, columns=read_columns), mixed)
+        except Exception as e:
+            print(f"Could not read sidecar for {path} [{sheet_name}]: {e}")
+            return None
+        try:
+            # The folder's modification time marks when the report was last opened
+            os.utime(self._entry_dir(path))
+        except OSError:
+            pass
+        # Parquet stores missing text as null; restore NaN as read_excel gives
+        for col in df.columns[df.dtypes == object]:
+            missing = df[col].isna()
+            if missing.any():
+                df.loc[missing, col] = np.nan
+        return df
+
+    def store(self, path, stamp, sheet_name, df, header=None):
+        """
+        Writes the sheet's sidecar; returns True if it can be loaded from now
+        on. When df holds only some columns, header lists all of the sheet's.
+        """
+        sheet_file = self._sheet_file(sheet_name)
+        try:
+            with self._lock:
+                manifest = self._manifest_for_update(path, stamp)
+                if sheet_name in manifest.get("unsupported", []):
+                    return False
+                try:
+                    encoded, mixed = _encode_mixed_columns(df)
+                    encoded.to_parquet(os.path.join(self._entry_dir(path), sheet_file), index=False)
+                except Exception as e:
+                    # Remember it so this file version is not retried
+                    print(f"Sheet [{sheet_name}] of {path} is read from Excel each time: {e}")
+                    manifest.setdefault("unsupported", []).append(sheet_name)
+                    self._save_manifest(path, manifest)
+                    return False
+                manifest["sheets"][sheet_name] = sheet_file
+                manifest.setdefault("columns", {})[sheet_name] = list(df.columns)
+                manifest.setdefault("headers", {})[sheet_name] = list(df.columns if header is None else header)
+                manifest.setdefault("mixed", {})[sheet_name] = mixed
+                self._save_manifest(path, manifest)
+                self.prune(keep=self._entry_dir(path))
+                return True
+        except OSError as e:
+            print(f"Could not write sidecar for {path} [{sheet_name}]: {e}")
+            return False
+
+    def prune(self, keep=None):
+        """
+        Removes the folders of reports not opened for max_age_days, then the
+        least recently opened ones until the cache fits in max_bytes. The
+        folder keep (the report being cached) is never removed.
+        """
+        entries = []
+        with os.scandir(self.directory) as folders:
+            for folder in folders:
+                if folder.is_dir() and folder.path != keep:
+                    size = sum(f.stat().st_size for f in os.scandir(folder.path) if f.is_file())
+                    entries.append((folder.stat().st_mtime, size, folder.path))
+        total = sum(size for _, size, _ in entries)
+        if keep and os.path.isdir(keep):
+            total += sum(f.stat().st_size for f in os.scandir(keep) if f.is_file())
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days is not None else None
+        # Oldest first
+        for mtime, size, folder in sorted(entries):
+            expired = cutoff is not None and mtime < cutoff
+            if expired or (self.max_bytes is not None and total > self.max_bytes):
+                shutil.rmtree(folder, ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _encode_mixed_columns(df):
+    """
+    Returns (frame Parquet can store, names of the mixed columns): each mixed
+    column as text plus a column of value type names (None for text and
+    missing values). Raises ValueError if a value would not read back as is.
+    """
+    mixed = [col for col in df.columns[df.dtypes == object]
+             if pd.api.types.infer_dtype(df[col], skipna=True) in ("mixed", "mixed-integer")]
+    if not mixed:
+        return df, []
+    encoded = {}
+    for col in mixed:
+        values = df[col].to_numpy()
+        missing = df[col].isna().to_numpy()
+        texts, types = [], []
+        for value, is_missing in zip(values, missing):
+            if is_missing:
+                texts.append(None)
+                types.append(None)
+            elif isinstance(value, str):
+                texts.append(value)
+                types.append(None)
+            elif type(value) in _VALUE_TYPES:
+                texts.append(str(value))
+                types.append(_VALUE_TYPES[type(value)])
+            else:
+                raise ValueError(f"column '{col}' holds values of type {type(value).__name__}")
+        encoded[col] = pd.Series(texts, index=df.index, dtype=object)
+        encoded[TYPE_COLUMN_PREFIX + col] = pd.Series(types, index=df.index, dtype=object)
+    frame = df.assign(**encoded)
+    decoded = _decode_mixed_columns(frame.copy(), mixed)
+    for col in mixed:
+        if not all(type(a) is type(b) and (a == b or (pd.isna(a) and pd.isna(b)))
+                   for a, b in zip(decoded[col], df[col])):
+            raise ValueError(f"column '{col}' would not read back unchanged")
+    return frame, mixed
+
+
+def _decode_mixed_columns(df, mixed):
+    # Converts mixed columns stored by _encode_mixed_columns back to their values
+    for col in mixed:
+        types = df.pop(TYPE_COLUMN_PREFIX + col).to_numpy(dtype=object)
+        texts = df[col].to_numpy(dtype=object)
+        df[col] = pd.Series([np.nan if pd.isna(text) else text if pd.isna(kind) else _VALUE_PARSERS[kind](text)
+                             for text, kind in zip(texts, types)], index=df.index, dtype=object)
+    return df
+
+
+_shared_sidecar_cache = SidecarCache() if sidecar_cache_dir else None
+
+
+def get_sidecar_cache():
+    """Returns the shared sidecar cache, or None when it is disabled in config."""
+    return _shared_sidecar_cache
@@ -1,16 +1,17 @@
-import pandas as pd
+import numpy as np
 import joblib
 from tkinter import messagebox
 import matplotlib
 matplotlib.use('Agg')
 from sentence_transformers import SentenceTransformer
+from workbook_cache import read_sheet
+from report_writer import ReportWriter, get_output_path
 
 
 def categorize_summaries(input_excel, model_path=None, should_cancel=None):
     try:
-        df = pd.read_excel(input_excel, sheet_name=0)
-        # Normalize column names to lowercase
-        df.columns = [col.lower() for col in df.columns]
+        # Column names come back normalized to lowercase
+        df = read_sheet(input_excel, 0)
         if 'summary' not in df.columns:
             messagebox.showerror("Error", "The selected Excel file does not contain a 'Summary' column.")
             return False
@@ -40,29 +41,26 @@ def categorize_summaries(input_excel, model_path=None, should_cancel=None):
                 messagebox.showerror("Prediction Error", f"Prediction error: {e}")
                 predicted_categories.append("Error")
 
-        df['Predicted_Category'] = predicted_categories
+        predicted_categories = np.array(predicted_categories, dtype=object)
 
         # Check for cancellation before saving
         if should_cancel and should_cancel():
             return False
 
         # Save categorized Excel with categories ordered alphabetically, but 'Others' last
-        categories = sorted([cat for cat in df['Predicted_Category'].unique() if cat != 'Others'])
-        ordered_categories = categories + (['Others'] if 'Others' in df['Predicted_Category'].unique() else [])
-        output_excel = input_excel.replace(".xlsx", "_categorized.xlsx")
+        found_categories = set(predicted_categories)
+        categories = sorted([cat for cat in found_categories if cat != 'Others'])
+        ordered_categories = categories + (['Others'] if 'Others' in found_categories else [])
+        output_excel = get_output_path(input_excel, "_categorized")
 
-        with pd.ExcelWriter(output_excel, engine='xlsxwriter') as writer:
+        # Rows are streamed straight from df into each category's sheet
+        with ReportWriter(output_excel) as writer:
             for cat in ordered_categories:
                 # Check for cancellation between each sheet
                 if should_cancel and should_cancel():
                     return False
-                    
-                df_cat = df[df['Predicted_Category'] == cat]
-                if not df_cat.empty:
-                    sheet_name = str(cat)[:31]
-                    original_cols = [col for col in df.columns if col not in ['Predicted_Category']]
-                    df_cat[original_cols].to_excel(writer, sheet_name=sheet_name, index=False, header=True)
-        
+                writer.write_sheet(str(cat)[:31], df, rows=np.flatnonzero(predicted_categories == cat))
+
         return output_excel  # Return the output path instead of showing message
 
     except Exception as e:
@@ -1,9 +1,30 @@
-import MeCab
-import ipadic
+import hashlib
+import json
+import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
 import mojimoji
+import pandas as pd
 from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+import nltk
 from nltk.stem import WordNetLemmatizer
+from config import (
+    token_cache_size, tokenizer_workers, tokenizer_chunk_size, parallel_min_rows,
+    lemma_cache_size, lemma_cache_path, persistent_token_cache_batch_size, tokenizer_backend
+)
+from tokenizer_backends import get_backend
+from token_cache import get_token_cache
+from workbook_cache import read_workbook
+
+# Bump when the token extraction rules change, so persisted tokens are invalidated
+TOKENIZER_VERSION = "1"
+
+ENGLISH_WORD_PATTERN = re.compile(r'[a-zA-Z]{2,}')
+ENGLISH_LOWER_PATTERN = re.compile(r'[a-z]{2,}')
 
 # Load Japanese stopwords
 def load_jp_stopwords(path="src/slothlib.txt"):
@@ -14,54 +35,295 @@ def load_jp_stopwords(path="src/slothlib.txt"):
     with open(path, encoding="utf-8") as f:
         return [line.strip() for line in f if line.strip()]
 
-# MeCab tokenizer: keep nouns, adjectives, proper nouns
-def process_text(series):
-    stop_words = set(load_jp_stopwords())
-    english_stopwords = set(ENGLISH_STOP_WORDS)
-    mecab = MeCab.Tagger(ipadic.MECAB_ARGS)
-    lemmatizer = WordNetLemmatizer()
-    def tokenizer_func(text):
-        tokens = []
-        # Japanese token extraction
-        node = mecab.parseToNode(str(text))
-        while node:
-            features = node.feature.split(',')
-            length = len(features)
-            if length > 6:
-                surface = features[6]
-            else:
-                surface = node.surface
-            is_pass = (surface == '*') or (len(surface) < 2) or (surface in stop_words)
-            noun_flag = (features[0] == '名詞')
-            proper_noun_flag = (features[0] == '名詞') and (features[1] == '固有名詞')
-            adjective_flag = (features[0] == '形容詞') and (features[1] == '自立')
-            if is_pass:
-                node = node.next
-                continue
-            elif proper_noun_flag:
-                tokens.append(surface)
-            elif noun_flag:
-                tokens.append(surface)
-            elif adjective_flag:
-                tokens.append(surface)
-            node = node.next
-        # English token extraction with lemmatization (nouns and verbs)
-        english_tokens = re.findall(r'[a-zA-Z]{2,}', text)
-        lemmatized_english = []
-        for w in english_tokens:
-            w_lower = w.lower()
-            lemma_noun = lemmatizer.lemmatize(w_lower, pos='n')
-            lemma_verb = lemmatizer.lemmatize(w_lower, pos='v')
+
+class LemmaCache:
+    """
+    Bounded word -> lemma table so each distinct lowercase English word is
+    lemmatized only once per process. When full, the oldest entry is dropped.
+    """
+
+    def __init__(self, max_size=lemma_cache_size):
+        self.max_size = max_size
+        self._lemmas = {}
+        self._lemmatizer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lemmas)
+
+    def load_lemmatizer(self):
+        with self._lock:
+            if self._lemmatizer is None:
+                lemmatizer = WordNetLemmatizer()
+                # WordNet is read lazily by NLTK, force it now so it counts as setup
+                lemmatizer.lemmatize('warm', pos='n')
+                self._lemmatizer = lemmatizer
+
+    def lemmatize(self, w_lower):
+        lemma = self._lemmas.get(w_lower)
+        if lemma is None:
+            if self._lemmatizer is None:
+                self.load_lemmatizer()
+            lemma_noun = self._lemmatizer.lemmatize(w_lower, pos='n')
+            lemma_verb = self._lemmatizer.lemmatize(w_lower, pos='v')
             # Prefer verb lemma if it changes the word, else noun lemma
             if lemma_verb != w_lower:
                 lemma = lemma_verb
             else:
                 lemma = lemma_noun
-            lemmatized_english.append(lemma)
-        tokens.extend([w for w in lemmatized_english if w not in english_stopwords])
-        print('Extracted tokens: ', tokens)
-        return " ".join(tokens)
-    series = series.map(tokenizer_func)
-    series = series.map(lambda x: x.lower())
-    series = series.map(mojimoji.zen_to_han)
-    return series
+            self._store(w_lower, lemma)
+        return lemma
+
+    def _store(self, w_lower, lemma):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if w_lower not in self._lemmas and len(self._lemmas) >= self.max_size:
+                # Dicts keep insertion order, so the first key is the oldest
+                self._lemmas.pop(next(iter(self._lemmas)))
+            self._lemmas[w_lower] = lemma
+
+    def save(self, path):
+        with self._lock:
+            lemmas = dict(self._lemmas)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(lemmas, f, ensure_ascii=False)
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            lemmas = json.load(f)
+        for w_lower, lemma in lemmas.items():
+            self._store(w_lower, lemma)
+        return len(lemmas)
+
+    def warm_from_wordcount(self, wordcount_excel):
+        """Pre-lemmatizes the English words of an existing word count workbook."""
+        excel_data = read_workbook(wordcount_excel, columns=['word'])
+        words = set()
+        for df in excel_data.values():
+            if 'word' in df.columns:
+                words.update(w for w in df['word'].dropna().astype(str) if ENGLISH_LOWER_PATTERN.fullmatch(w))
+        for w in words:
+            self.lemmatize(w)
+        return len(words)
+
+
+_shared_lemma_cache = None
+_shared_lemma_cache_lock = threading.Lock()
+
+def get_lemma_cache():
+    """Returns the process-wide lemma table, loaded from lemma_cache_path if it exists."""
+    global _shared_lemma_cache
+    with _shared_lemma_cache_lock:
+        if _shared_lemma_cache is None:
+            _shared_lemma_cache = LemmaCache()
+            if lemma_cache_path and os.path.exists(lemma_cache_path):
+                try:
+                    _shared_lemma_cache.load(lemma_cache_path)
+                except Exception as e:
+                    print(f"Lemma cache load failed: {e}")
+        return _shared_lemma_cache
+
+
+def save_lemma_cache():
+    if lemma_cache_path and _shared_lemma_cache is not None:
+        _shared_lemma_cache.save(lemma_cache_path)
+
+
+class Tokenizer:
+    """
+    Long-lived tokenizer that keeps a Japanese backend (MeCab + ipadic by
+    default, see tokenizer_backends) and the stopword lists loaded between
+    calls, with English lemmas looked up through a shared LemmaCache.
+    Resources are loaded on first use.
+
+    Results are memoized per summary text in a bounded LRU cache owned by the
+    instance, so cache entries are always specific to this tokenizer's config.
+    Pass cache_size=0 to disable it. tokenize_many() also consults an optional
+    persistent TokenCache, keyed by fingerprint(), before tokenizing.
+    """
+
+    def __init__(self, stopwords_path="src/slothlib.txt", cache_size=token_cache_size, lemma_cache=None,
+                 persistent_cache=None, ascii_fast_path=True, backend=None):
+        self.stopwords_path = stopwords_path
+        self.backend_name = backend or tokenizer_backend
+        self.ascii_fast_path = ascii_fast_path
+        self.cache_size = cache_size
+        self.lemma_cache = lemma_cache
+        self.persistent_cache = persistent_cache
+        self._fingerprint = None
+        self._lock = threading.RLock()
+        self._loaded = False
+        if cache_size:
+            self._cached_tokenize = lru_cache(maxsize=cache_size)(self._tokenize_tuple)
+        else:
+            self._cached_tokenize = self._tokenize_tuple
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._stop_words = set(load_jp_stopwords(self.stopwords_path))
+            self._english_stopwords = set(ENGLISH_STOP_WORDS)
+            backend = get_backend(self.backend_name)
+            backend.load()
+            self._backend = backend
+            if self.lemma_cache is None:
+                self.lemma_cache = get_lemma_cache()
+            self.lemma_cache.load_lemmatizer()
+            self._loaded = True
+
+    # Keep nouns, adjectives, proper nouns
+    def tokenize(self, text):
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            return list(self._cached_tokenize(text))
+
+    def fingerprint(self):
+        """Identifies everything that affects the tokens: rules, stopwords and dictionary."""
+        if self._fingerprint is None:
+            self.load()
+            digest = hashlib.sha1()
+            digest.update(TOKENIZER_VERSION.encode("utf-8"))
+            digest.update("\n".join(sorted(self._stop_words)).encode("utf-8"))
+            digest.update("\n".join(sorted(self._english_stopwords)).encode("utf-8"))
+            digest.update(f"{self._backend.name}:{self._backend.version()}".encode("utf-8"))
+            digest.update(nltk.__version__.encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def tokenize_many(self, texts, workers=None, chunk_size=None, min_rows=None):
+        """
+        Yields the tokens of each text in input order, consuming texts lazily.
+        Inputs with at least min_rows texts are split into chunks of chunk_size
+        and tokenized by a pool of worker processes, each with its own warm
+        tokenizer. Only a few chunks per worker are in flight at a time.
+        """
+        if self.persistent_cache is None:
+            yield from self._tokenize_many(texts, workers, chunk_size, min_rows)
+            return
+        fingerprint = self.fingerprint()
+        texts = iter(texts)
+        while True:
+            batch = list(islice(texts, persistent_token_cache_batch_size))
+            if not batch:
+                break
+            cached = self.persistent_cache.get_many(batch, fingerprint)
+            missing = [text for text, tokens in zip(batch, cached) if tokens is None]
+            fresh = iter(list(self._tokenize_many(missing, workers, chunk_size, min_rows)))
+            new_items = []
+            for text, tokens in zip(batch, cached):
+                if tokens is None:
+                    tokens = next(fresh)
+                    new_items.append((text, tokens))
+                yield tokens
+            self.persistent_cache.put_many(new_items, fingerprint)
+
+    def _tokenize_many(self, texts, workers=None, chunk_size=None, min_rows=None):
+        workers = workers or tokenizer_workers or os.cpu_count() or 1
+        chunk_size = chunk_size or tokenizer_chunk_size
+        min_rows = parallel_min_rows if min_rows is None else min_rows
+        texts = iter(texts)
+        head = list(islice(texts, min_rows)) if workers > 1 else []
+        if workers <= 1 or len(head) < min_rows:
+            for text in chain(head, texts):
+                yield self.tokenize(text)
+            return
+        texts = chain(head, texts)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker_tokenizer,
+            initargs=(self.stopwords_path, self.cache_size, self.backend_name, self.ascii_fast_path)
+        ) as pool:
+            pending = deque()
+            while True:
+                chunk = list(islice(texts, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_tokenize_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def cache_info(self):
+        """Returns (hits, misses, maxsize, currsize) of the summary cache."""
+        if self.cache_size:
+            return self._cached_tokenize.cache_info()
+        return None
+
+    def cache_clear(self):
+        if self.cache_size:
+            self._cached_tokenize.cache_clear()
+
+    def _tokenize_tuple(self, text):
+        # Cached results are shared between callers, so keep them immutable
+        return tuple(self._tokenize(text))
+
+    def _tokenize(self, text):
+        stop_words = self._stop_words
+        tokens = []
+        text_str = str(text)
+        # Backends leave half-width ASCII words to the English branch below,
+        # so ASCII-only rows never yield Japanese tokens: skip the backend
+        if not (self.ascii_fast_path and text_str.isascii()):
+            # Japanese token extraction
+            for surface in self._backend.extract(text_str):
+                is_pass = (surface == '*') or (len(surface) < 2) or (surface in stop_words)
+                if not is_pass:
+                    tokens.append(surface)
+        # English token extraction with lemmatization (nouns and verbs)
+        english_tokens = ENGLISH_WORD_PATTERN.findall(text_str)
+        lemmatize = self.lemma_cache.lemmatize
+        lemmatized_english = [lemmatize(w.lower()) for w in english_tokens]
+        tokens.extend([w for w in lemmatized_english if w not in self._english_stopwords])
+        return tokens
+
+
+# Worker process state for parallel tokenization
+_worker_tokenizer = None
+
+def _init_worker_tokenizer(stopwords_path, cache_size, backend_name, ascii_fast_path):
+    global _worker_tokenizer
+    _worker_tokenizer = Tokenizer(stopwords_path, cache_size, ascii_fast_path=ascii_fast_path, backend=backend_name)
+    _worker_tokenizer.load()
+
+def _tokenize_chunk(texts):
+    return [_worker_tokenizer.tokenize(text) for text in texts]
+
+
+_shared_tokenizer = None
+_shared_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """Returns the process-wide tokenizer shared by word counting and classification."""
+    global _shared_tokenizer
+    with _shared_tokenizer_lock:
+        if _shared_tokenizer is None:
+            _shared_tokenizer = Tokenizer(persistent_cache=get_token_cache())
+        return _shared_tokenizer
+
+
+@lru_cache(maxsize=65536)
+def normalize_token(token):
+    return mojimoji.zen_to_han(token.lower())
+
+
+def iter_tokens(texts, tokenizer=None, vocabulary=None, workers=None, chunk_size=None):
+    """
+    Yields the normalized (lowercase, half-width) tokens of each text, one row
+    at a time. If a vocabulary dict is given, yields lists of integer token IDs
+    instead and adds unseen tokens to it.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    for tokens in tokenizer.tokenize_many(texts, workers=workers, chunk_size=chunk_size):
+        tokens = [normalize_token(t) for t in tokens]
+        if vocabulary is not None:
+            tokens = [vocabulary.setdefault(t, len(vocabulary)) for t in tokens]
+        yield tokens
+
+
+def process_text(series, tokenizer=None, workers=None, chunk_size=None):
+    tokens = iter_tokens(series, tokenizer=tokenizer, workers=workers, chunk_size=chunk_size)
+    return pd.Series([" ".join(t) for t in tokens], index=series.index, name=series.name, dtype=object)
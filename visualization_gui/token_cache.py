@@ -0,0 +1,158 @@
+"""
+Persistent on-disk cache of tokenized summaries.
+
+Entries are keyed by a hash of the summary text together with the tokenizer
+fingerprint, so changing the stopword list, MeCab dictionary or tokenizer
+rules never serves stale tokens. Maintenance from the command line:
+
+    python token_cache.py stats|clear|compact
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config import persistent_token_cache_path, persistent_token_cache_max_entries
+
+TOKEN_SEPARATOR = "\x1f"
+# SQLite limits the number of bound parameters per statement
+_QUERY_BATCH = 500
+
+
+class TokenCache:
+    def __init__(self, path=persistent_token_cache_path, max_entries=persistent_token_cache_max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Sheets may be counted in parallel processes sharing one database
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            "key BLOB PRIMARY KEY, tokens TEXT NOT NULL, last_used INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tokens_last_used ON tokens (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text, fingerprint):
+        return hashlib.sha1(f"{fingerprint}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, texts, fingerprint):
+        """Returns the cached token list of each text, or None where missing."""
+        keys = [self.make_key(text, fingerprint) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _QUERY_BATCH):
+                batch = keys[start:start + _QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, tokens FROM tokens WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = int(time.time())
+                self._conn.executemany(
+                    "UPDATE tokens SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        results = []
+        for key in keys:
+            value = found.get(key)
+            if value is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(value.split(TOKEN_SEPARATOR) if value else [])
+        return results
+
+    def put_many(self, items, fingerprint):
+        """Stores (text, tokens) pairs and trims the cache to max_entries."""
+        if not items:
+            return
+        now = int(time.time())
+        rows = [(self.make_key(text, fingerprint), TOKEN_SEPARATOR.join(tokens), now) for text, tokens in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO tokens (key, tokens, last_used) VALUES (?, ?, ?)", rows)
+            self._trim()
+            self._conn.commit()
+
+    def _trim(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM tokens").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            # Least recently used entries go first
+            self._conn.execute(
+                "DELETE FROM tokens WHERE key IN (SELECT key FROM tokens ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM tokens").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM tokens")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+        self.hits = 0
+        self.misses = 0
+
+    def compact(self):
+        """Applies the size limit and reclaims free space in the database file."""
+        with self._lock:
+            self._trim()
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_token_cache = None
+_shared_token_cache_lock = threading.Lock()
+
+def get_token_cache():
+    """Returns the process-wide persistent cache, or None when it is disabled in config."""
+    global _shared_token_cache
+    if not persistent_token_cache_path:
+        return None
+    with _shared_token_cache_lock:
+        if _shared_token_cache is None:
+            _shared_token_cache = TokenCache()
+        return _shared_token_cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the persistent token cache.")
+    parser.add_argument("command", choices=["stats", "clear", "compact"])
+    parser.add_argument("--path", default=persistent_token_cache_path, help="Cache database file")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("no cache path given and persistent_token_cache_path is not set in config.py")
+    cache = TokenCache(args.path)
+    if args.command == "clear":
+        cache.clear()
+    elif args.command == "compact":
+        cache.compact()
+    for name, value in cache.stats().items():
+        print(f"{name}: {value}")
+    cache.close()
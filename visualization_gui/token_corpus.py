@@ -0,0 +1,202 @@
+from array import array
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from text_preprocessing import iter_tokens
+
+
+class Vocabulary:
+    """Interns tokens as consecutive integer IDs, in first-seen order."""
+
+    def __init__(self, words=None):
+        self.ids = {}
+        self.words = []
+        for word in words or []:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def add(self, word):
+        token_id = self.ids.get(word)
+        if token_id is None:
+            token_id = len(self.words)
+            self.ids[word] = token_id
+            self.words.append(word)
+        return token_id
+
+    def get(self, word, default=None):
+        return self.ids.get(word, default)
+
+
+class TokenCorpusBuilder:
+    """Collects token lists one document at a time into compact arrays."""
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self._offsets = array('q', [0])
+        self._ids = array('i')
+
+    def append(self, tokens):
+        add = self.vocabulary.add
+        self._ids.extend(add(t) for t in tokens)
+        self._offsets.append(len(self._ids))
+
+    def build(self):
+        return TokenCorpus(
+            self.vocabulary,
+            np.frombuffer(self._offsets, dtype=np.int64),
+            np.frombuffer(self._ids, dtype=np.int32)
+        )
+
+
+class TokenCorpus:
+    """
+    Tokenized documents stored CSR style: the token IDs of document i are
+    ids[offsets[i]:offsets[i + 1]], with IDs taken from a shared Vocabulary.
+    """
+
+    def __init__(self, vocabulary, offsets, ids):
+        self.vocabulary = vocabulary
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int32)
+
+    @classmethod
+    def from_token_lists(cls, token_lists, vocabulary=None):
+        builder = TokenCorpusBuilder(vocabulary)
+        for tokens in token_lists:
+            builder.append(tokens)
+        return builder.build()
+
+    @classmethod
+    def from_processed(cls, series, vocabulary=None):
+        """Builds a corpus from process_text output (space-separated token strings)."""
+        return cls.from_token_lists((str(s).split() for s in series), vocabulary)
+
+    @classmethod
+    def from_texts(cls, texts, vocabulary=None, tokenizer=None):
+        """Tokenizes raw summaries straight into a corpus, one row at a time."""
+        return cls.from_token_lists(iter_tokens(texts, tokenizer=tokenizer), vocabulary)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def doc(self, i):
+        words = self.vocabulary.words
+        return [words[t] for t in self.ids[self.offsets[i]:self.offsets[i + 1]]]
+
+    def _token_mask(self, rows):
+        # Expands a per-document selection to a per-token boolean mask
+        rows = np.asarray(rows)
+        if rows.dtype != bool:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[rows] = True
+            rows = mask
+        return np.repeat(rows, self.lengths)
+
+    def select(self, rows):
+        """Returns a corpus holding only the selected documents (mask or indices)."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        lengths = self.lengths[rows]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        starts = np.repeat(self.offsets[rows], lengths)
+        within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        return TokenCorpus(self.vocabulary, offsets, self.ids[starts + within])
+
+    def counts(self, rows=None):
+        """Token counts over all or the selected documents, indexed by token ID."""
+        ids = self.ids if rows is None else self.ids[self._token_mask(rows)]
+        return np.bincount(ids, minlength=len(self.vocabulary))
+
+    def counts_by(self, group_codes, n_groups=None):
+        """
+        Token counts per document group as a (n_groups, vocabulary) array.
+        group_codes holds one non-negative group code per document.
+        """
+        group_codes = np.asarray(group_codes, dtype=np.int64)
+        n_groups = int(group_codes.max()) + 1 if n_groups is None else n_groups
+        n_words = len(self.vocabulary)
+        flat = np.repeat(group_codes, self.lengths) * n_words + self.ids
+        return np.bincount(flat, minlength=n_groups * n_words).reshape(n_groups, n_words)
+
+    def to_word_count_df(self, rows=None):
+        return counts_to_word_count_df(self.counts(rows), self.vocabulary)
+
+    def doc_term_matrix(self, binary=False):
+        """Sparse (documents x vocabulary) matrix of token counts, or presence if binary."""
+        doc_index = np.repeat(np.arange(len(self)), self.lengths)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(self.ids), dtype=np.int64), (doc_index, self.ids)),
+            shape=(len(self), len(self.vocabulary))
+        )
+        if binary:
+            matrix.data[:] = 1
+        return matrix
+
+    def ngram_matrix(self, n):
+        """
+        Returns a sparse (documents x n-grams) count matrix and the n-gram
+        token ID tuples, one row of `grams` per column of the matrix.
+        """
+        lengths = self.lengths
+        position = np.arange(len(self.ids)) - np.repeat(self.offsets[:-1], lengths)
+        starts = np.flatnonzero(position <= np.repeat(lengths - n, lengths))
+        # Number n-grams incrementally: (prefix ID, next token) -> new prefix ID
+        gram_ids = self.ids[starts].astype(np.int64)
+        for k in range(1, n):
+            keys = gram_ids * len(self.vocabulary) + self.ids[starts + k]
+            unique_keys, gram_ids = np.unique(keys, return_inverse=True)
+            gram_ids = gram_ids.astype(np.int64)
+        n_grams = int(gram_ids.max()) + 1 if len(gram_ids) else 0
+        doc_index = np.repeat(np.arange(len(self)), np.maximum(lengths - n + 1, 0))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(starts), dtype=np.int64), (doc_index, gram_ids)),
+            shape=(len(self), n_grams)
+        )
+        # Token IDs of each n-gram, taken from its first occurrence
+        first = np.zeros(n_grams, dtype=np.int64)
+        first[gram_ids[::-1]] = starts[::-1]
+        grams = np.stack([self.ids[first + k] for k in range(n)], axis=1) if n_grams else np.zeros((0, n), dtype=np.int32)
+        return matrix, grams
+
+    def ngram_counts_df(self, n, top_n=None):
+        """Word/Count table of the most frequent n-grams, words joined by spaces."""
+        matrix, grams = self.ngram_matrix(n)
+        counts = np.asarray(matrix.sum(axis=0)).ravel()
+        order = np.argsort(-counts, kind='stable')[:top_n]
+        words = self.vocabulary.words
+        labels = [" ".join(words[t] for t in grams[i]) for i in order]
+        return pd.DataFrame({'Word': labels, 'Count': counts[order]})
+
+    def cooccurrence_matrix(self):
+        """
+        Sparse upper-triangular (vocabulary x vocabulary) matrix counting the
+        documents in which each pair of distinct tokens appears together.
+        """
+        presence = self.doc_term_matrix(binary=True)
+        return sparse.triu(presence.T @ presence, k=1).tocoo()
+
+    def cooccurrence_counts_df(self, top_n=None):
+        matrix = self.cooccurrence_matrix()
+        order = np.argsort(-matrix.data, kind='stable')[:top_n]
+        words = self.vocabulary.words
+        labels = [f"{words[matrix.row[i]]} {words[matrix.col[i]]}" for i in order]
+        return pd.DataFrame({'Word': labels, 'Count': matrix.data[order]})
+
+
+def counts_to_word_count_df(counts, vocabulary):
+    """Converts a counts vector into the Word/Count table used by the plots."""
+    counts = np.asarray(counts)
+    present = np.flatnonzero(counts)
+    order = present[np.argsort(-counts[present], kind='stable')]
+    words = vocabulary.words
+    return pd.DataFrame({'Word': [words[i] for i in order], 'Count': counts[order]})
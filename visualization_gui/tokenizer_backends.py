@@ -0,0 +1,110 @@
+"""
+Japanese tokenizer backends.
+
+Each backend turns a summary into candidate base forms with its own part of
+speech filter (nouns, proper nouns and independent adjectives). Stopword and
+length filtering, and all English handling, stay in text_preprocessing, so
+backends leave half-width ASCII words alone.
+"""
+import re
+
+
+class MeCabIpadicBackend:
+    """Default backend: MeCab with the bundled ipadic dictionary."""
+    name = "mecab-ipadic"
+
+    def __init__(self):
+        self._tagger = None
+
+    def load(self):
+        import MeCab
+        import ipadic
+        self._tagger = MeCab.Tagger(ipadic.MECAB_ARGS)
+
+    def version(self):
+        info = self._tagger.dictionary_info()
+        return f"{info.filename}:{info.version}:{info.size}:{info.charset}"
+
+    def extract(self, text):
+        # ipadic features: pos, pos detail 1-3, conjugation type/form, base form, ...
+        # Half-width ASCII runs are unknown words with base form '*', which the caller drops
+        tokens = []
+        node = self._tagger.parseToNode(text)
+        while node:
+            features = node.feature.split(',')
+            if len(features) > 6:
+                surface = features[6]
+            else:
+                surface = node.surface
+            noun_flag = (features[0] == '名詞')
+            adjective_flag = (features[0] == '形容詞') and (features[1] == '自立')
+            if noun_flag or adjective_flag:
+                tokens.append(surface)
+            node = node.next
+        return tokens
+
+
+class FugashiUnidicBackend:
+    """fugashi with a UniDic dictionary (unidic or unidic-lite must be installed)."""
+    name = "fugashi-unidic"
+
+    def __init__(self):
+        self._tagger = None
+
+    def load(self):
+        import fugashi
+        self._tagger = fugashi.Tagger()
+
+    def version(self):
+        import fugashi
+        info = self._tagger.dictionary_info[0]
+        return f"fugashi {fugashi.__version__}:{info['filename']}:{info['version']}:{info['size']}"
+
+    def extract(self, text):
+        tokens = []
+        for word in self._tagger(text):
+            if word.surface.isascii():
+                continue
+            feature = word.feature
+            noun_flag = (feature.pos1 == '名詞') and (feature.pos2 != '数詞')
+            adjective_flag = (feature.pos1 == '形容詞') and (feature.pos2 == '一般')
+            if noun_flag or adjective_flag:
+                lemma = getattr(feature, 'lemma', None) or word.surface
+                # Loanword lemmas carry their origin, e.g. 'ログイン-login'
+                tokens.append(lemma.split('-')[0])
+        return tokens
+
+
+class NgramBackend:
+    """
+    Dictionary-free fallback for environments where MeCab cannot be installed:
+    katakana runs are kept whole and kanji runs are split into bigrams.
+    """
+    name = "ngram"
+    KATAKANA_RUN = re.compile(r'[ァ-ヺーｦ-ﾟ]{2,}')
+    KANJI_RUN = re.compile(r'[一-鿿々]{2,}')
+
+    def load(self):
+        pass
+
+    def version(self):
+        return "1"
+
+    def extract(self, text):
+        tokens = self.KATAKANA_RUN.findall(text)
+        for run in self.KANJI_RUN.findall(text):
+            if len(run) == 2:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        return tokens
+
+
+BACKENDS = {backend.name: backend for backend in (MeCabIpadicBackend, FugashiUnidicBackend, NgramBackend)}
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown tokenizer backend '{name}'. Available: {', '.join(BACKENDS)}")
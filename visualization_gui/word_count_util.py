@@ -1,33 +1,260 @@
 import pandas as pd
 from collections import Counter
 from tkinter import messagebox
+import json
 import os
-from text_preprocessing import process_text
+import re
+import tempfile
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from config import word_count_sheet_workers, all_categories_sheet, issue_key_column
+from get_utils import get_sheet_names
+from report_loader import load_report
+from excel_reader import iter_sheet_rows, read_excel
+from workbook_cache import normalize_header
+from heavy_hitters import SpaceSaving
+from token_corpus import TokenCorpusBuilder
+from text_preprocessing import iter_tokens, save_lemma_cache
 
 
-def word_count(input_excel):
+def read_header(rows):
+    """Takes the header row from an iter_sheet_rows iterator, normalized as the workbook cache does."""
+    header = next(rows, None) or ()
+    return [normalize_header(col) if col is not None else None for col in header]
+
+
+def iter_column_values(rows, header, column, *extra_columns):
+    """
+    Yields the values of one column, row by row, from the remaining rows of
+    an iter_sheet_rows iterator. Returns None if the header has no such column.
+    With extra_columns, yields tuples instead; missing extra columns give None.
+    """
+    if column not in header:
+        return None
+    index = header.index(column)
+    extra_indexes = [header.index(col) if col in header else None for col in extra_columns]
+    def values():
+        for row in rows:
+            value = row[index] if index < len(row) else None
+            if value is None:
+                continue
+            if extra_columns:
+                extras = tuple(row[i] if i is not None and i < len(row) else None for i in extra_indexes)
+                yield (value,) + extras
+            else:
+                yield value
+    return values()
+
+
+def count_words(summaries, workers=None, top_k_capacity=None, corpus_builder=None):
+    """
+    Counts tokens exactly with a Counter, or approximately within a fixed
+    memory budget with a SpaceSaving summary when top_k_capacity is given.
+    Token lists are also appended to corpus_builder when one is given.
+    """
+    word_counts = SpaceSaving(top_k_capacity) if top_k_capacity else Counter()
+    for tokens in iter_tokens(summaries, workers=workers):
+        word_counts.update(tokens)
+        if corpus_builder is not None:
+            corpus_builder.append(tokens)
+    return word_counts
+
+
+def _count_rows(rows, workers, skip_keys, top_k_capacity, keep_corpus, skip_blank_keys=False):
+    # rows yields (summary, issue key); returns the counts, the counted keys and the corpus
+    keys = []
+    corpus_builder = TokenCorpusBuilder() if keep_corpus else None
+    def summaries():
+        for summary, key in rows:
+            if key is not None and str(key).strip():
+                key = str(key)
+                if key in skip_keys:
+                    continue
+                keys.append(key)
+            elif skip_blank_keys:
+                keys.append(None)
+                continue
+            yield summary
+    word_counts = count_words(summaries(), workers, top_k_capacity, corpus_builder)
+    return word_counts, keys, (corpus_builder.build() if keep_corpus else None)
+
+
+def count_sheet_words(input_excel, sheet_name, streaming=False, workers=None, skip_keys=frozenset(),
+                      top_k_capacity=None, keep_corpus=False, skip_blank_keys=False):
+    """
+    Returns (word Counter, issue keys counted, TokenCorpus) for one sheet, or
+    None if it has no summary column. Rows whose issue key is in skip_keys are
+    not counted, nor, with skip_blank_keys, rows without an issue key, which
+    appear as None in the key list. The key list is None when the sheet has
+    no issue key column, and the corpus is None unless keep_corpus is set.
+    """
+    if streaming:
+        with closing(iter_sheet_rows(input_excel, sheet_name)) as sheet_rows:
+            header = read_header(sheet_rows)
+            has_keys = issue_key_column in header
+            rows = iter_column_values(sheet_rows, header, 'summary', issue_key_column)
+            if rows is None:
+                return None
+            word_counts, keys, corpus = _count_rows(rows, workers, skip_keys, top_k_capacity, keep_corpus,
+                                                    skip_blank_keys)
+    else:
+        df = load_report(input_excel, ['summary', issue_key_column], sheet_name)
+        if 'summary' not in df.columns:
+            return None
+        has_keys = issue_key_column in df.columns
+        keys_column = df[issue_key_column].astype(object).where(df[issue_key_column].notna(), None) if has_keys else [None] * len(df)
+        word_counts, keys, corpus = _count_rows(zip(df['summary'], keys_column), workers, skip_keys, top_k_capacity,
+                                                keep_corpus, skip_blank_keys)
+    return word_counts, (keys if has_keys else None), corpus
+
+
+def _count_sheet_in_worker(input_excel, sheet_name, streaming, skip_keys, top_k_capacity, keep_corpus,
+                           skip_blank_keys):
+    # Sheets already run in parallel, so tokenize each one in-process
+    return count_sheet_words(input_excel, sheet_name, streaming, workers=1, skip_keys=skip_keys,
+                             top_k_capacity=top_k_capacity, keep_corpus=keep_corpus, skip_blank_keys=skip_blank_keys)
+
+
+def count_workbook_words(input_excel, sheet_names, streaming=False, workers=None, skip_keys=frozenset(),
+                         top_k_capacity=None, keep_corpus=False, skip_blank_keys=False):
+    """
+    Counts words for every sheet, one sheet per worker process when there are
+    several. Rows whose issue key is in skip_keys are left out of every sheet.
+    """
+    workers = workers or word_count_sheet_workers or os.cpu_count() or 1
+    if workers <= 1 or len(sheet_names) <= 1:
+        return [count_sheet_words(input_excel, sheet_name, streaming, skip_keys=skip_keys,
+                                  top_k_capacity=top_k_capacity, keep_corpus=keep_corpus,
+                                  skip_blank_keys=skip_blank_keys)
+                for sheet_name in sheet_names]
+    with ProcessPoolExecutor(max_workers=min(workers, len(sheet_names))) as pool:
+        futures = [
+            pool.submit(_count_sheet_in_worker, input_excel, sheet_name, streaming, skip_keys, top_k_capacity,
+                        keep_corpus, skip_blank_keys)
+            for sheet_name in sheet_names
+        ]
+        return [future.result() for future in futures]
+
+
+# Sheet names written by write_corpus_sheets, e.g. "UI 2gram" or "UI cooc (2)"
+CORPUS_SHEET_PATTERN = re.compile(r" (\d+gram|cooc)( \(\d+\))?$")
+
+
+def get_state_path(wordcount_excel):
+    return os.path.splitext(wordcount_excel)[0] + "_state.json"
+
+
+def load_word_count_state(wordcount_excel):
+    state_path = get_state_path(wordcount_excel)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def remove_word_count_state(wordcount_excel):
+    # A state file left by an earlier run would describe a different table
+    state_path = get_state_path(wordcount_excel)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+def save_word_count_state(wordcount_excel, sheet_keys):
+    """Records which issue keys each word count sheet already includes."""
+    state = {"key_column": issue_key_column, "sheets": sheet_keys}
+    with open(get_state_path(wordcount_excel), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+
+
+def word_counts_to_df(word_counts):
+    if isinstance(word_counts, SpaceSaving):
+        # Approximate tables carry each word's maximum overestimate
+        return word_counts.to_df()
+    word_count_df = pd.DataFrame({'Word': list(word_counts.keys()), 'Count': list(word_counts.values())})
+    return word_count_df.sort_values('Count', ascending=False)
+
+
+def _corpus_sheet_name(sheet_name, suffix, used):
+    # e.g. "UI 2gram"; the category is shortened to fit 31 characters and a
+    # number appended when that name is taken, such as by a long category
+    # sharing its first characters
+    name, n = f"{sheet_name[:31 - len(suffix)].rstrip()}{suffix}", 2
+    while name.lower() in used:
+        number = f" ({n})"
+        name = f"{sheet_name[:31 - len(suffix) - len(number)].rstrip()}{suffix}{number}"
+        n += 1
+    used.add(name.lower())
+    return name
+
+
+def write_corpus_sheets(writer, sheet_name, corpus, ngram_sizes=(), cooccurrence=False, top_n=100, used=None):
+    """
+    Writes the top n-gram and co-occurring word pair tables of one sheet.
+    used holds the lowercase sheet names already in the workbook; the new
+    names are added to it.
+    """
+    used = set() if used is None else used
+    for n in ngram_sizes:
+        corpus.ngram_counts_df(n, top_n).to_excel(writer, sheet_name=_corpus_sheet_name(sheet_name, f" {n}gram", used),
+                                                  index=False)
+    if cooccurrence:
+        corpus.cooccurrence_counts_df(top_n).to_excel(writer, sheet_name=_corpus_sheet_name(sheet_name, " cooc", used),
+                                                      index=False)
+
+
+def word_count(input_excel, streaming=False, top_k_capacity=None, ngram_sizes=(), cooccurrence=False):
+    """
+    Writes a Word/Count table per sheet of input_excel, plus a combined
+    "All Categories" table when there are several sheets. With streaming=True,
+    only the summary column is read, row by row, so memory is bounded by the
+    vocabulary instead of the sheet size. If the report has an issue key
+    column, the counted keys are saved next to the output for update_word_count.
+    With top_k_capacity, each sheet keeps at most that many words, counted
+    approximately with an Error column bounding the overestimate.
+    ngram_sizes and cooccurrence add sheets with the most frequent n-grams and
+    word pairs appearing in the same summary, computed from the same tokens.
+    """
     output_excel = input_excel.replace(".xlsx", "_wordcount.xlsx")
-    xls = pd.ExcelFile(input_excel)
+    sheet_names = get_sheet_names(input_excel)
     wrote_any = False
     # Use a temporary writer, only create file if data is written
     error_message = None
     try:
+        keep_corpus = bool(ngram_sizes) or cooccurrence
+        results = count_workbook_words(input_excel, sheet_names, streaming, top_k_capacity=top_k_capacity,
+                                       keep_corpus=keep_corpus)
+        sheet_keys = {}
         with pd.ExcelWriter(output_excel, engine='xlsxwriter') as writer:
-            for sheet_name in xls.sheet_names:
-                df = pd.read_excel(xls, sheet_name=sheet_name)
-                df.columns = [col.lower() for col in df.columns]
-                if 'summary' not in df.columns:
+            total_counts = SpaceSaving(top_k_capacity) if top_k_capacity else Counter()
+            for sheet_name, result in zip(sheet_names, results):
+                if result is None:
                     error_message = "Summary' column not found."
                     break
-                all_tokens = []
-                for tokens_str in process_text(df['summary']):
-                    all_tokens.extend(str(tokens_str).split())
-                if all_tokens:
-                    word_counts = Counter(all_tokens)
-                    word_count_df = pd.DataFrame({'Word': list(word_counts.keys()), 'Count': list(word_counts.values())})
-                    word_count_df.sort_values('Count', ascending=False).to_excel(writer, sheet_name=sheet_name[:31], index=False)
+                word_counts, keys, _ = result
+                if keys is not None:
+                    sheet_keys.setdefault(sheet_name[:31], []).extend(keys)
+                if word_counts:
+                    word_counts_to_df(word_counts).to_excel(writer, sheet_name=sheet_name[:31], index=False)
+                    if top_k_capacity:
+                        total_counts.merge(word_counts)
+                    else:
+                        total_counts.update(word_counts)
                     wrote_any = True
+            written_sheets = [name[:31] for name, result in zip(sheet_names, results) if result and result[0]]
+            if not error_message and len(written_sheets) > 1 and all_categories_sheet not in written_sheets:
+                word_counts_to_df(total_counts).to_excel(writer, sheet_name=all_categories_sheet, index=False)
+            if not error_message and keep_corpus:
+                used = {name.lower() for name in written_sheets + [all_categories_sheet]}
+                for sheet_name, result in zip(sheet_names, results):
+                    if result[0]:
+                        write_corpus_sheets(writer, sheet_name, result[2], ngram_sizes, cooccurrence, used=used)
         # Writer is closed here
+        # Approximate counts and n-gram sheets cannot be topped up exactly, so they get no state
+        if wrote_any and not error_message and sheet_keys and not top_k_capacity and not keep_corpus:
+            save_word_count_state(output_excel, sheet_keys)
+        else:
+            remove_word_count_state(output_excel)
+        save_lemma_cache()
         if error_message:
             if os.path.exists(output_excel):
                 os.remove(output_excel)
@@ -44,4 +271,96 @@ def word_count(input_excel):
                 os.remove(output_excel)
         except Exception:
             pass
-        raise
\ No newline at end of file
+        raise
+
+
+def read_word_count_tables(wordcount_excel):
+    """
+    Reads every Word/Count sheet as a Counter, keeping words such as 'nan' as
+    text. Raises ValueError for approximate (top-K) tables and tables with
+    n-gram or co-occurrence sheets, which cannot be topped up exactly.
+    """
+    tables = read_excel(wordcount_excel, sheet_name=None, keep_default_na=False, na_values=[])
+    counters = {}
+    for sheet_name, df in tables.items():
+        df.columns = [str(col).lower() for col in df.columns]
+        if 'error' in df.columns:
+            raise ValueError(f"Sheet '{sheet_name}' holds approximate top-K counts, which cannot be updated.")
+        if CORPUS_SHEET_PATTERN.search(sheet_name):
+            raise ValueError(f"Sheet '{sheet_name}' is an n-gram or co-occurrence table, which cannot be updated.")
+        counters[sheet_name] = Counter(dict(zip(df['word'].astype(str), df['count'].astype(int))))
+    return counters
+
+
+def update_word_count(wordcount_excel, new_excel, streaming=False):
+    """
+    Adds the rows of new_excel whose issue keys are not yet counted, in any
+    sheet, to an existing word count table, using the state file written by
+    word_count. Only the new rows are tokenized; other sheets are carried over
+    from the existing table without recounting. Jira names export sheets after
+    the export time, so a single-sheet export is added to the table's single
+    sheet. Rows without an issue key cannot be told apart from ones already
+    counted and are skipped; the message reports how many.
+    """
+    state = load_word_count_state(wordcount_excel)
+    if state is None:
+        return None, False, "No word count state file found for this table. Run a full word count first."
+    try:
+        tables = read_word_count_tables(wordcount_excel)
+    except ValueError as e:
+        return None, False, f"{e} Run a full exact word count instead."
+    seen_keys = {sheet: set(keys) for sheet, keys in state["sheets"].items()}
+    sheet_names = get_sheet_names(new_excel)
+    # Keys are matched across sheets: the same issue may be in a differently named sheet
+    skip_keys = frozenset().union(*seen_keys.values())
+    results = count_workbook_words(new_excel, sheet_names, streaming, skip_keys=skip_keys, skip_blank_keys=True)
+    category_sheets = [name for name in tables if name != all_categories_sheet]
+    single_sheet = category_sheets[0] if len(sheet_names) == 1 and len(category_sheets) == 1 else None
+
+    new_counts = {}
+    blank_rows = 0
+    for sheet_name, result in zip(sheet_names, results):
+        if result is None:
+            return None, False, "Summary' column not found."
+        word_counts, keys, _ = result
+        if keys is None:
+            return None, False, f"'{issue_key_column}' column not found in sheet '{sheet_name}'."
+        blank_rows += keys.count(None)
+        keys = [key for key in keys if key is not None]
+        if keys:
+            target = single_sheet or sheet_name[:31]
+            seen_keys.setdefault(target, set()).update(keys)
+            new_counts.setdefault(target, Counter()).update(word_counts)
+    skipped_message = f"{blank_rows} rows without an issue key were skipped." if blank_rows else None
+    new_counts = {name: counts for name, counts in new_counts.items() if counts}
+    if not new_counts:
+        return wordcount_excel, False, " ".join(filter(None, ["No new defect reports found.", skipped_message]))
+
+    has_combined_sheet = all_categories_sheet in tables
+    combined = tables.pop(all_categories_sheet, None)
+    for sheet_name, counts in new_counts.items():
+        tables.setdefault(sheet_name, Counter()).update(counts)
+        if combined is not None:
+            combined.update(counts)
+    if not has_combined_sheet and len(tables) > 1:
+        combined = Counter()
+        for counts in tables.values():
+            combined.update(counts)
+
+    # Write next to the original and swap it in, so a failure keeps the old table
+    fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(wordcount_excel)))
+    os.close(fd)
+    try:
+        with pd.ExcelWriter(temp_path, engine='xlsxwriter') as writer:
+            for sheet_name, counts in tables.items():
+                word_counts_to_df(counts).to_excel(writer, sheet_name=sheet_name, index=False)
+            if combined is not None:
+                word_counts_to_df(combined).to_excel(writer, sheet_name=all_categories_sheet, index=False)
+        os.replace(temp_path, wordcount_excel)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    save_word_count_state(wordcount_excel, {sheet: sorted(keys) for sheet, keys in seen_keys.items()})
+    save_lemma_cache()
+    return wordcount_excel, True, skipped_message
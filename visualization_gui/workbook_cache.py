@@ -0,0 +1,191 @@
+"""
+In-process cache of parsed Excel sheets.
+
+Sheets are parsed once per file version (path, modification time and size),
+with headers normalized to stripped lowercase, and evicted least recently
+used first when the cache grows past its memory budget. Callers get shallow
+copies: they may rename columns, add columns or filter rows freely, but must
+not modify cached values in place.
+
+Sheets parsed from Excel are also written to the on-disk sidecar cache, so
+other processes and later sessions skip the Excel parsing too. A read of
+only some columns parses only those (plus any the sidecar already holds)
+and is not kept in memory.
+"""
+import os
+import threading
+from collections import OrderedDict
+from config import workbook_cache_max_bytes
+from sidecar_cache import get_sidecar_cache
+from excel_reader import open_workbook
+
+
+def normalize_header(col):
+    return str(col).strip().lower()
+
+
+def normalize_columns(df):
+    df.columns = [normalize_header(col) for col in df.columns]
+    return df
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WorkbookCache:
+    def __init__(self, max_bytes=workbook_cache_max_bytes, sidecar=None):
+        self.max_bytes = max_bytes
+        self.sidecar = sidecar
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (path, sheet name) -> (file stamp, DataFrame, size in bytes), least recently used first
+        self._sheets = OrderedDict()
+        self._sheet_names = {}
+        self._bytes = 0
+
+    def sheet_names(self, path):
+        path = os.path.abspath(path)
+        stamp = _file_stamp(path)
+        with self._lock:
+            cached = self._sheet_names.get(path)
+            if cached and cached[0] == stamp:
+                return list(cached[1])
+        names = self.sidecar.sheet_names(path, stamp) if self.sidecar else None
+        if names is None:
+            # Only the workbook index is read here, not the sheets
+            with open_workbook(path) as xls:
+                names = xls.sheet_names
+            if self.sidecar:
+                self.sidecar.store_sheet_names(path, stamp, names)
+        with self._lock:
+            self._sheet_names[path] = (stamp, names)
+        return list(names)
+
+    def read_sheet(self, path, sheet_name=0, columns=None):
+        """
+        Returns one sheet by name or position, parsing it only if it is not
+        cached. With columns, returns only those of them the sheet has.
+        """
+        if isinstance(sheet_name, int):
+            sheet_name = self.sheet_names(path)[sheet_name]
+        return self._read(path, [sheet_name], columns)[sheet_name]
+
+    def read_workbook(self, path, columns=None):
+        """Returns every sheet as {sheet name: DataFrame}, in workbook order."""
+        return self._read(path, self.sheet_names(path), columns)
+
+    def _read(self, path, sheet_names, columns=None):
+        path = os.path.abspath(path)
+        stamp = _file_stamp(path)
+        sheets = {}
+        with self._lock:
+            for name in sheet_names:
+                entry = self._sheets.get((path, name))
+                if entry and entry[0] == stamp:
+                    self._sheets.move_to_end((path, name))
+                    sheets[name] = entry[1]
+        missing = [name for name in sheet_names if name not in sheets]
+        if missing and self.sidecar:
+            for name in missing:
+                df = self.sidecar.load(path, stamp, name, columns)
+                if df is not None:
+                    sheets[name] = df
+                    # Projected reads are cheap to repeat; keep only whole sheets in memory
+                    if columns is None:
+                        with self._lock:
+                            self._store((path, name), stamp, df)
+        parsed = [name for name in missing if name not in sheets]
+        if parsed:
+            # Open the file once for all missing sheets; the handle is not kept,
+            # so the file can still be overwritten while it is cached
+            with open_workbook(path) as xls:
+                for name in parsed:
+                    if columns is None:
+                        df = normalize_columns(xls.parse(name))
+                        sheets[name] = df
+                        if self.sidecar:
+                            self.sidecar.store(path, stamp, name, df)
+                        with self._lock:
+                            self._store((path, name), stamp, df)
+                        continue
+                    # Keep the columns the sidecar already has, so it only grows
+                    stored = self.sidecar.stored_columns(path, stamp, name) if self.sidecar else None
+                    wanted = set(columns) | set(stored or ())
+                    header = {}
+                    def use_column(col):
+                        header[normalize_header(col)] = None
+                        return normalize_header(col) in wanted
+                    df = normalize_columns(xls.parse(name, usecols=use_column))
+                    sheets[name] = df
+                    if self.sidecar:
+                        self.sidecar.store(path, stamp, name, df, list(header))
+        with self._lock:
+            self.hits += len(sheet_names) - len(parsed)
+            self.misses += len(parsed)
+        if columns is None:
+            return {name: sheets[name].copy(deep=False) for name in sheet_names}
+        return {name: sheets[name][[col for col in columns if col in sheets[name].columns]] for name in sheet_names}
+
+    def prefetch(self, path):
+        """Parses the remaining sheets of path in a background thread."""
+        def run():
+            try:
+                self.read_workbook(path)
+            except Exception as e:
+                print(f"Could not prefetch {path}: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _store(self, key, stamp, df):
+        old = self._sheets.pop(key, None)
+        if old:
+            self._bytes -= old[2]
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            # Larger than the whole budget: serve it without keeping it
+            return
+        self._sheets[key] = (stamp, df, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._sheets.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def invalidate(self, path=None):
+        """Drops the cached sheets of one file, or of every file."""
+        with self._lock:
+            if path is None:
+                self._sheets.clear()
+                self._sheet_names.clear()
+                self._bytes = 0
+                return
+            path = os.path.abspath(path)
+            self._sheet_names.pop(path, None)
+            for key in [key for key in self._sheets if key[0] == path]:
+                self._bytes -= self._sheets.pop(key)[2]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sheets": len(self._sheets),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_shared_workbook_cache = WorkbookCache(sidecar=get_sidecar_cache())
+
+
+def get_workbook_cache():
+    return _shared_workbook_cache
+
+
+def read_workbook(path, columns=None):
+    return _shared_workbook_cache.read_workbook(path, columns)
+
+
+def read_sheet(path, sheet_name=0, columns=None):
+    return _shared_workbook_cache.read_sheet(path, sheet_name, columns)